@@ -1,12 +1,31 @@
-import json
-import requests
-from datetime import datetime
-import nltk
+import os
+import sys
 from stock_app.models import Post, Stock
+from django.db import transaction
 from django.core.management.base import BaseCommand
 
-nltk.download('vader_lexicon')
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+# Shared VADER scoring engine from the offline dataset prep. Inside this repo it is found next
+# door; a copy of this command in stock_app/management/commands needs sentiment_scoring.py on
+# the path, or STOCK_VISION_DATASET_PREP set to the repo's neural_network/dataset_prep
+DATASET_PREP_DIR = os.environ.get('STOCK_VISION_DATASET_PREP', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'neural_network', 'dataset_prep'))
+try:
+    from sentiment_scoring import score_texts
+except ModuleNotFoundError as e:
+    if e.name != 'sentiment_scoring':
+        raise
+    sys.path.append(DATASET_PREP_DIR)
+    try:
+        from sentiment_scoring import score_texts
+    except ModuleNotFoundError as e:
+        if e.name != 'sentiment_scoring':
+            raise
+        raise ImportError(f"New_potsst needs sentiment_scoring.py from stock-vision's neural_network/dataset_prep, "
+                          f"not found in {DATASET_PREP_DIR}; set STOCK_VISION_DATASET_PREP to that folder") from None
+# reddit_fetcher.py and reddit_state.py are copied along with this file
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from reddit_fetcher import RedditFetcher
+from reddit_state import CollectionState
 
 # Define stocks and subreddits
 STOCKS = [
@@ -25,97 +44,89 @@ TICKERS = [
 
 SUBREDDITS = ['Investing', 'Stocks', 'WallStreetBets', 'Options', 'GlobalMarkets']
 
+# Newest collected post per (subreddit, stock) and the Reddit ids already saved per ticker;
+# the only record of what is in the Post table, so keep it with the database
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reddit_state.sqlite')
+
 # Function to fetch Reddit posts with no time limit
-def fetch_reddit_posts(subreddit, stocks, max_posts_per_stock=None):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    stock_posts = {stock: [] for stock in stocks}
-    base_url = f"https://reddit.com/r/{subreddit}/search.json"
-    
-    for stock in stocks:
-        after = None
-        while max_posts_per_stock is None or len(stock_posts[stock]) < max_posts_per_stock:
-            params = {
-                'q': stock,  # Search for the stock keyword
-                'sort': 'new',  # Sort by the newest posts
-                'limit': 1000,  # Maximum allowed posts per request
-                'restrict_sr': True,  # Restrict to the subreddit
-                'after': after  # Pagination parameter
-            }
-            
-            response = requests.get(base_url, headers=headers, params=params)
-            if response.status_code != 200:
-                print(f"Error {response.status_code} while fetching {stock} from {subreddit}")
-                break
-            
-            try:
-                data = response.json()
-            except ValueError as e:
-                print("Error parsing JSON:", e)
-                break
-            
-            if 'data' not in data or 'children' not in data['data']:
-                break
-            
-            posts = data['data']['children']
-            if not posts:  # Exit if no more posts
-                break
-            
-            for post in posts:
-                post_data = post['data']
-                title = post_data['title'].lower()
-                author = post_data.get('author', 'N/A')
-                created_utc = post_data.get('created_utc')
-                created_time = datetime.utcfromtimestamp(created_utc).strftime('%Y-%m-%d %H:%M:%S') if created_utc else "N/A"
-                
-                stock_posts[stock].append({
-                    'title': title,
-                    'author': author,
-                    'created_time': created_time
-                })
-                
-                # Break if the desired number of posts is reached
-                if max_posts_per_stock and len(stock_posts[stock]) >= max_posts_per_stock:
-                    break
-            
-            # Update `after` for pagination
-            after = data['data'].get('after')
-            if not after:
-                break
-    
-    return stock_posts
+def fetch_reddit_posts(subreddit, stocks, max_posts_per_stock=None, fetcher=None):
+    fetcher = fetcher or RedditFetcher()
+    return fetcher.fetch_all([subreddit], stocks, max_posts_per_stock)[subreddit]
 
 # Function to perform sentiment analysis on text
 def analyze_sentiment(text):
-    sid = SentimentIntensityAnalyzer()
-    result = sid.polarity_scores(text)
-    return result['compound']
+    return score_texts([text], workers=1, fields=('compound',))[0, 0]
+
+def score_titles(titles, workers=None):
+    # One batched pass; the analyzer is built once per worker instead of per title
+    return score_texts(titles, workers=workers, fields=('compound',))[:, 0]
+
+def save_posts(all_posts, stocks, state, batch_size=500, workers=None, walks=None):
+    """Insert the unsaved posts of {subreddit: {stock: [post, ...]}} in one transaction.
+
+    The Stock rows are loaded once, every new title is scored in one batch
+    and the Post rows go in with bulk_create. Post rows carry no Reddit id
+    and stock_app has no unique key on them, so the state file is all that
+    keeps a post from being inserted twice: a fresh state_path re-inserts
+    every post it fetches. walks (RedditFetcher.walks) move the watermarks
+    and resume points once the rows are in.
+    """
+    stock_map = {stock_obj.ticker: stock_obj for stock_obj in Stock.objects.filter(ticker__in=TICKERS)}
+
+    rows = []
+    for i, stock in enumerate(stocks):
+        if TICKERS[i] not in stock_map:
+            print(f"Stock {TICKERS[i]} not found in the database.")
+            continue
+        posts = [post for subreddit in all_posts for post in all_posts[subreddit][stock]]
+        rows.extend((TICKERS[i], post) for post in state.unseen(TICKERS[i], posts))
+
+    sentiments = score_titles([post['title'] for _, post in rows], workers)
+    with transaction.atomic():
+        Post.objects.bulk_create([
+            Post(
+                stock=stock_map[ticker],
+                author=post['author'],
+                time=post['created_time'],
+                sentiment=sentiment,
+                text=post['title'],
+            )
+            for (ticker, post), sentiment in zip(rows, sentiments)
+        ], batch_size=batch_size)
+
+    # Only once the rows are committed, so an interrupted run fetches them again
+    for i, stock in enumerate(stocks):
+        if TICKERS[i] not in stock_map:
+            continue
+        state.mark_seen(TICKERS[i], [post for ticker, post in rows if ticker == TICKERS[i]])
+        for subreddit in all_posts:
+            if walks is not None:
+                state.save_walk(subreddit, stock, walks[subreddit, stock])
+    print(f"Saved {len(rows)} new posts")
+    return len(rows)
 
 # Main function to fetch posts, analyze sentiment, and save to database
-def get_aggregated_stock_posts(subreddits, stocks, max_posts_per_stock=None):
-    for subreddit in subreddits:
-        print(f"Fetching posts from r/{subreddit}")
-        stock_posts = fetch_reddit_posts(subreddit, stocks, max_posts_per_stock)
-        
-        for i, stock in enumerate(stocks):
-            print(f"Processing stock: {TICKERS[i]}")
-            try:
-                stock_obj = Stock.objects.get(ticker=TICKERS[i])
-            except Stock.DoesNotExist:
-                print(f"Stock {TICKERS[i]} not found in the database.")
-                continue
-            
-            for post in stock_posts[stock]:
-                sentiment = analyze_sentiment(post['title'])
-                p = Post.objects.create(
-                    stock=stock_obj,
-                    author=post['author'],
-                    time=post['created_time'],
-                    sentiment=sentiment,
-                    text=post['title'],
-                )
-                p.save()
+def get_aggregated_stock_posts(subreddits, stocks, max_posts_per_stock=None, state_path=STATE_PATH,
+                               batch_size=500, workers=None):
+    # Every (subreddit, stock) search runs concurrently under one rate limit,
+    # and stops at the newest post an earlier run already saved
+    state = CollectionState(state_path)
+    print(f"Fetching posts from {', '.join('r/' + subreddit for subreddit in subreddits)}")
+    fetcher = RedditFetcher()
+    all_posts = fetcher.fetch_all(subreddits, stocks, max_posts_per_stock, state.watermarks(),
+                                  state.resume_points())
+    fetcher.close()
+    print(f"{fetcher.requests_made} requests")
+
+    save_posts(all_posts, stocks, state, batch_size, workers, fetcher.walks)
+    state.close()
 
 # Django command to execute the script
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Posts per INSERT")
+        parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: all cores)")
+
     def handle(self, *args, **kwargs):
-        get_aggregated_stock_posts(SUBREDDITS, STOCKS, max_posts_per_stock=1000)
+        get_aggregated_stock_posts(SUBREDDITS, STOCKS, max_posts_per_stock=1000,
+                                   batch_size=kwargs['batch_size'], workers=kwargs['workers'])
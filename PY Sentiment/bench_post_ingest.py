@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import types
+import shutil
+import argparse
+import tempfile
+
+import django
+from django.conf import settings
+
+# The Django project with stock_app is not part of this repo; the benchmark
+# runs the command's write path against a throwaway SQLite database with
+# Stock and Post models carrying the fields the command uses.
+folder = tempfile.mkdtemp()
+settings.configure(
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(folder, 'bench.sqlite3')}},
+    INSTALLED_APPS=[],
+    USE_TZ=False,
+)
+django.setup()
+
+from django.db import models, connection
+
+
+class Stock(models.Model):
+    ticker = models.CharField(max_length=10, unique=True)
+
+    class Meta:
+        app_label = 'stock_app'
+
+
+class Post(models.Model):
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    author = models.CharField(max_length=100)
+    time = models.DateTimeField()
+    sentiment = models.FloatField()
+    text = models.TextField()
+
+    class Meta:
+        app_label = 'stock_app'
+
+
+stock_app = types.ModuleType('stock_app')
+stock_app.models = types.ModuleType('stock_app.models')
+stock_app.models.Stock, stock_app.models.Post = Stock, Post
+sys.modules['stock_app'], sys.modules['stock_app.models'] = stock_app, stock_app.models
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import New_potsst
+from reddit_state import CollectionState
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+
+def fake_posts(subreddits, stocks, posts_per_stock):
+    words = ['calls', 'puts', 'moon', 'crash', 'great', 'terrible', 'earnings', 'beat', 'miss', 'buy', 'sell']
+    return {subreddit: {stock: [{
+        'id': f'{s}_{i}_{k}',
+        'name': f't3_{s}_{i}_{k}',
+        'title': f"{stock} {' '.join(words[(k + j) % len(words)] for j in range(k % 7 + 3))}",
+        'author': f'user{k % 50}',
+        'created_utc': 1700000000 + k * 60,
+        'created_time': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1700000000 + k * 60)),
+    } for k in range(posts_per_stock)] for i, stock in enumerate(stocks)} for s, subreddit in enumerate(subreddits)}
+
+
+def per_row_ingest(all_posts, stocks):
+    """The command's original write path: a Stock lookup per pair, an analyzer per title, create() + save()."""
+    for subreddit in all_posts:
+        for i, stock in enumerate(stocks):
+            stock_obj = Stock.objects.get(ticker=New_potsst.TICKERS[i])
+            for post in all_posts[subreddit][stock]:
+                sentiment = SentimentIntensityAnalyzer().polarity_scores(post['title'])['compound']
+                p = Post.objects.create(stock=stock_obj, author=post['author'], time=post['created_time'],
+                                        sentiment=sentiment, text=post['title'])
+                p.save()
+
+
+def reset():
+    Post.objects.all().delete()
+
+
+def benchmark(posts_per_stock=20, batch_size=500, workers=1):
+    with connection.schema_editor() as editor:
+        editor.create_model(Stock)
+        editor.create_model(Post)
+    Stock.objects.bulk_create([Stock(ticker=ticker) for ticker in New_potsst.TICKERS])
+    all_posts = fake_posts(New_potsst.SUBREDDITS, New_potsst.STOCKS, posts_per_stock)
+    n = sum(len(posts) for by_stock in all_posts.values() for posts in by_stock.values())
+
+    start = time.perf_counter()
+    per_row_ingest(all_posts, New_potsst.STOCKS)
+    before = n / (time.perf_counter() - start)
+    print(f"per-row: {n} posts, {before:.0f} rows/s")
+    reset()
+
+    state = CollectionState(os.path.join(folder, 'state.sqlite'))
+    start = time.perf_counter()
+    saved = New_potsst.save_posts(all_posts, New_potsst.STOCKS, state, batch_size, workers)
+    after = saved / (time.perf_counter() - start)
+    print(f"bulk: {saved} posts, {after:.0f} rows/s ({after / before:.1f}x)")
+    assert Post.objects.count() == n
+
+    # A second pass over the same posts inserts nothing
+    New_potsst.save_posts(all_posts, New_potsst.STOCKS, state, batch_size, workers)
+    assert Post.objects.count() == n
+    state.close()
+    return before, after
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rows/sec of the Post write path, per-row vs bulk, on SQLite.")
+    parser.add_argument('--posts', type=int, default=20, help="Posts per (subreddit, stock)")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=1, help="Scoring processes for the bulk path")
+    args = parser.parse_args()
+
+    try:
+        benchmark(args.posts, args.batch_size, args.workers)
+    finally:
+        connection.close()
+        shutil.rmtree(folder)
@@ -1,16 +1,38 @@
 # stockapp/utils.py
 
+import os
+import sys
 import json
 import requests
 import pandas as pd
 from textblob import TextBlob
 from datetime import datetime
 
-def fetch_reddit_posts(subreddit, stocks, limit_per_stock=15):
+# Shared single-pass ticker matcher from the offline dataset prep
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'neural_network', 'dataset_prep'))
+from ticker_matcher import TickerMatcher
+
+def fetch_reddit_posts(subreddit, stocks, limit_per_stock=15, state=None):
+    """Newest posts of r/{subreddit} whose title mentions each stock.
+
+    With a reddit_state.CollectionState the walk stops at the newest post a
+    previous call returned, posts already returned for a stock are skipped,
+    and the watermark moves to the newest post of this call, but only if the
+    walk got down to the old watermark or the end of the listing; a walk cut
+    short by the per-stock limit or a bad response leaves it, so the posts
+    it did not reach are walked again next time.
+    """
     url = f"https://reddit.com/r/{subreddit}.json"
     headers = {"User-Agent": "Mozilla/5.0"}
     stock_posts = {stock: [] for stock in stocks}
     params = {'limit': 100}
+    watermark = state.watermark(subreddit) if state is not None else None
+    # Each stock keyword as a whole-word name, found in one scan per title
+    matcher = TickerMatcher({stock: [stock] for stock in stocks}, tickers=False)
+    newest = None
+    # Whether the walk got down to the old watermark or the end of the listing without dropping any post
+    complete = False
+    dropped = False
 
     while any(len(posts) < limit_per_stock for posts in stock_posts.values()):
         response = requests.get(url, headers=headers, params=params)
@@ -19,8 +41,17 @@ def fetch_reddit_posts(subreddit, stocks, limit_per_stock=15):
         if 'data' not in data or 'children' not in data['data']:
             break
 
+        caught_up = False
         for post in data["data"]["children"]:
             post_data = post["data"]
+            # A post without a timestamp says nothing about where the listing is
+            created = post_data.get("created_utc")
+            if watermark and (post_data.get("name") == watermark[0] or (created is not None and created < watermark[1])):
+                caught_up = True
+                break
+            if newest is None and post_data.get("created_utc") is not None:
+                newest = post_data
+
             title = post_data["title"].lower()
             author = post_data.get("author", "N/A")
             created_utc = post_data.get("created_utc", None)
@@ -31,21 +62,34 @@ def fetch_reddit_posts(subreddit, stocks, limit_per_stock=15):
             else:
                 created_time = "N/A"
 
-            for stock in stocks:
-                if stock in title and len(stock_posts[stock]) < limit_per_stock:
+            for stock in matcher.match(title):
+                if len(stock_posts[stock]) < limit_per_stock:
                     stock_posts[stock].append({
+                        'id': post_data.get("id"),
                         'title': title,
                         'author': author,
                         'created_time': created_time
                     })
                     if all(len(posts) >= limit_per_stock for posts in stock_posts.values()):
                         break
+                else:
+                    dropped = True
 
+        if caught_up:
+            complete = True
+            break
         if 'data' in data and 'after' in data['data'] and data['data']['after']:
             url = f"https://reddit.com/r/{subreddit}.json?after={data['data']['after']}"
         else:
+            complete = True
             break
 
+    if state is not None:
+        for stock in stocks:
+            stock_posts[stock] = state.unseen(stock, stock_posts[stock])
+            state.mark_seen(stock, stock_posts[stock])
+        if complete and not dropped and newest is not None:
+            state.advance(subreddit, '', [newest])
     return stock_posts
 
 def analyze_sentiment(text):
@@ -0,0 +1,117 @@
+import os
+import sys
+import csv
+import argparse
+
+from reddit_fetcher import RedditFetcher, REDDIT_URL
+from reddit_state import CollectionState
+
+# Collects new Reddit search results into the post_data/ CSVs the dataset
+# prep reads: one posts.csv row per post and one stock_index.csv row per
+# (post, ticker). Each subreddit is searched for each ticker symbol.
+
+sentiment_dir = os.path.dirname(os.path.abspath(__file__))
+data_root = os.path.dirname(sentiment_dir)
+sys.path.append(os.path.join(data_root, 'neural_network', 'dataset_prep'))
+from schema import POST_COLUMNS, STOCK_INDEX_COLUMNS
+
+STOCKS = ['AAPL', 'GME', 'MCD', 'MSFT', 'NFLX', 'NVDA', 'TSLA']
+SUBREDDITS = ['wallstreetbets', 'stocks', 'investing', 'StockMarket']
+
+# A new file gets schema's POST_COLUMNS / STOCK_INDEX_COLUMNS header, the existing post_data/ CSVs' order
+# Columns the dataset prep reads (ingest.IngestCache, dataset_all.load_post_stock)
+POST_REQUIRED = ['id', 'created_utc', 'title', 'selftext']
+STOCK_INDEX_REQUIRED = ['id', 'stock_symbol']
+
+
+def _csv_header(path, required):
+    """Header of an existing CSV, None for a new one; raises ValueError if it lacks a required column."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, newline='') as f:
+        header = next(csv.reader(f), [])
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column; its header is {header}")
+    return header
+
+
+def _append_csv(path, header, columns, rows):
+    # Rows are dicts written in the file's own column order; columns it does not have are left out
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=header or columns, restval='', extrasaction='ignore')
+        if header is None:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def fetch_posts(data_root=data_root, subreddits=SUBREDDITS, stocks=STOCKS, max_posts_per_stock=None,
+                state_path=None, fetcher=None):
+    """Search every subreddit for every ticker and append the posts not collected yet to post_data/.
+
+    Progress lives in post_data/fetch_state.sqlite by default: searches
+    stop at the newest post of the previous run, a search cut short by
+    max_posts_per_stock or a failed request resumes where it stopped, and
+    a post already stored for a ticker is not added again. Returns the
+    number of new posts.
+    """
+    post_dir = os.path.join(data_root, 'post_data')
+    os.makedirs(post_dir, exist_ok=True)
+    posts_path = os.path.join(post_dir, 'posts.csv')
+    stock_index_path = os.path.join(post_dir, 'stock_index.csv')
+    # Checked before fetching, so a file the prep could not read is never appended to
+    posts_header = _csv_header(posts_path, POST_REQUIRED)
+    stock_index_header = _csv_header(stock_index_path, STOCK_INDEX_REQUIRED)
+    state = CollectionState(state_path or os.path.join(post_dir, 'fetch_state.sqlite'))
+    own_fetcher = fetcher is None
+    fetcher = fetcher or RedditFetcher()
+    stock_posts = fetcher.fetch_all(subreddits, stocks, max_posts_per_stock, state.watermarks(),
+                                    state.resume_points())
+    if own_fetcher:
+        fetcher.close()
+
+    fresh = {}
+    for stock in stocks:
+        posts = [post for subreddit in subreddits for post in stock_posts[subreddit][stock]
+                 if post['created_utc'] is not None]
+        fresh[stock] = state.unseen(stock, posts)
+    new_posts = {}
+    for posts in fresh.values():
+        for post in posts:
+            new_posts.setdefault(post['id'], post)
+    # A post found for another ticker in an earlier run already has its posts.csv row
+    stored = state.stored(list(new_posts))
+
+    _append_csv(posts_path, posts_header, POST_COLUMNS,
+                ({column: post[column] if column != 'created_utc' else int(post[column]) for column in POST_COLUMNS}
+                 for post_id, post in new_posts.items() if post_id not in stored))
+    _append_csv(stock_index_path, stock_index_header, STOCK_INDEX_COLUMNS,
+                ({'id': post['id'], 'stock_symbol': stock, 'created_utc': int(post['created_utc'])}
+                 for stock, posts in fresh.items() for post in posts))
+
+    # Only once the rows are written, so an interrupted run fetches them again
+    for stock, posts in fresh.items():
+        state.mark_seen(stock, posts)
+        for subreddit in subreddits:
+            state.save_walk(subreddit, stock, fetcher.walks[subreddit, stock])
+    state.close()
+    print(f"{len(new_posts) - len(stored)} new posts, {sum(map(len, fresh.values()))} (post, ticker) rows "
+          f"in {fetcher.requests_made} requests")
+    return len(new_posts) - len(stored)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Append new Reddit posts about the stocks to post_data/.")
+    parser.add_argument('--data-root', default=data_root, help="Folder holding post_data/")
+    parser.add_argument('--subreddits', nargs='+', default=SUBREDDITS)
+    parser.add_argument('--stocks', nargs='+', default=STOCKS)
+    parser.add_argument('--max-posts', type=int, default=1000, help="Newest posts kept per (subreddit, stock) search")
+    parser.add_argument('--state', default=None, help="Progress database (default: post_data/fetch_state.sqlite)")
+    parser.add_argument('--base-url', default=REDDIT_URL)
+    parser.add_argument('--rate', type=float, default=1.0, help="Requests per second")
+    parser.add_argument('--workers', type=int, default=8, help="Requests in flight")
+    args = parser.parse_args()
+
+    fetcher = RedditFetcher(args.base_url, rate=args.rate, max_workers=args.workers)
+    fetch_posts(args.data_root, args.subreddits, args.stocks, args.max_posts, args.state, fetcher)
+    fetcher.close()
@@ -0,0 +1,374 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+from requests.adapters import HTTPAdapter
+
+REDDIT_URL = "https://reddit.com"
+USER_AGENT = "Mozilla/5.0"
+# Reddit returns at most 100 posts per listing page whatever limit is asked for
+PAGE_SIZE = 100
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate requests per second, bursts of up to burst."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # A 429 applies to the whole client, so every worker waits it out
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def parse_post(post_data):
+    """The post fields the collection scripts keep, from one listing child's data."""
+    created_utc = post_data.get('created_utc')
+    return {
+        'id': post_data.get('id'),
+        'name': post_data.get('name'),
+        'title': post_data['title'].lower(),
+        'author': post_data.get('author', 'N/A'),
+        'selftext': post_data.get('selftext', ''),
+        'subreddit': post_data.get('subreddit'),
+        'permalink': post_data.get('permalink'),
+        'url': post_data.get('url'),
+        'created_utc': created_utc,
+        'created_time': datetime.utcfromtimestamp(created_utc).strftime('%Y-%m-%d %H:%M:%S') if created_utc else "N/A",
+    }
+
+
+def retry_after_seconds(value, default):
+    """Seconds to wait from a Retry-After header, either delay-seconds or an HTTP-date; default if unusable."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def reached(post_data, watermark):
+    """Whether a newest-first listing got to the already collected part."""
+    if watermark is None:
+        return False
+    name, created_utc = watermark
+    # A post without a timestamp says nothing about where the listing is
+    created = post_data.get('created_utc')
+    return post_data.get('name') == name or (created is not None and created < created_utc)
+
+
+class RedditFetcher:
+    """Searches many (subreddit, stock) pairs concurrently over one keep-alive session.
+
+    At most max_workers requests are in flight, all of them drawn from a
+    shared token bucket. A 429 pauses the bucket for Retry-After (or an
+    exponential backoff) and the request is retried. Pagination cursors
+    are kept per (subreddit, stock) in self.cursors, and how each search's
+    last walk ended in self.walks (see fetch_stock).
+    """
+
+    def __init__(self, base_url=REDDIT_URL, rate=1.0, burst=5, max_workers=8, max_retries=5,
+                 backoff=2.0, timeout=30, user_agent=USER_AGENT):
+        self.base_url = base_url.rstrip('/')
+        self.bucket = TokenBucket(rate, burst)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cursors = {}
+        self.exhausted = {}
+        self.walks = {}
+        self.requests_made = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_json(self, path, params):
+        """GET base_url + path under the rate limit; None once it keeps failing."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            with self.lock:
+                self.requests_made += 1
+            delay = self.backoff * 2 ** attempt * (1 + random.random() / 4)
+            try:
+                response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Error fetching {path}: {e}")
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 429:
+                with self.lock:
+                    self.throttled += 1
+                self.bucket.pause(retry_after_seconds(response.headers.get('Retry-After'), delay))
+                continue
+            if response.status_code >= 500:
+                time.sleep(delay)
+                continue
+            if response.status_code != 200:
+                print(f"Error {response.status_code} while fetching {path}")
+                return None
+            try:
+                return response.json()
+            except ValueError as e:
+                print("Error parsing JSON:", e)
+                return None
+        print(f"Giving up on {path} after {self.max_retries + 1} attempts")
+        return None
+
+    def fetch_pages(self, subreddit, stock):
+        """Yield the listing pages of one search, newest first, following its cursor.
+
+        Afterwards self.exhausted[(subreddit, stock)] tells whether the pages
+        ran out (True) or a request failed for good (False).
+        """
+        key = (subreddit, stock)
+        self.exhausted[key] = False
+        while True:
+            params = {
+                'q': stock,
+                'sort': 'new',
+                'limit': PAGE_SIZE,
+                'restrict_sr': True,
+                'after': self.cursors.get(key),
+            }
+            data = self.get_json(f"/r/{subreddit}/search.json", params)
+            if not data or 'data' not in data or 'children' not in data['data']:
+                return
+            children = data['data']['children']
+            if not children:
+                self.exhausted[key] = True
+                return
+            self.cursors[key] = data['data'].get('after')
+            yield [child['data'] for child in children]
+            if not self.cursors[key]:
+                self.exhausted[key] = True
+                return
+
+    def _walk(self, posts, key, after, watermark, max_posts):
+        # Appends posts from cursor `after` on; True once it reaches the watermark or the end of the listing
+        if max_posts is not None and len(posts) >= max_posts:
+            return False
+        self.cursors[key] = after
+        for page in self.fetch_pages(*key):
+            for post_data in page:
+                if reached(post_data, watermark):
+                    return True
+                posts.append(parse_post(post_data))
+                if max_posts is not None and len(posts) >= max_posts:
+                    return False
+        return self.exhausted[key]
+
+    def fetch_stock(self, subreddit, stock, max_posts=None, watermark=None, resume=None):
+        """Newest-first posts of one search, stopping at the watermark (name, created_utc) if given.
+
+        resume ({'after', 'newest'}, from CollectionState.resume_points) first
+        finishes an interrupted walk from its cursor down to the watermark.
+        self.walks[(subreddit, stock)] then holds the outcome for
+        CollectionState.save_walk: the new watermark, which only moves once a
+        walk got down to the old one or to the end of the listing, and, for a
+        walk cut short by max_posts or a failed request, where to resume it.
+        """
+        key = (subreddit, stock)
+        posts = []
+        if resume is not None:
+            if not self._walk(posts, key, resume['after'], watermark, max_posts):
+                after = posts[-1]['name'] if posts else resume['after']
+                self.walks[key] = {'watermark': None, 'resume': {'after': after, 'newest': resume['newest']}}
+                return posts
+            watermark = resume['newest']
+
+        first = len(posts)
+        complete = self._walk(posts, key, None, watermark, max_posts)
+        newest = next(((post['name'], post['created_utc']) for post in posts[first:]
+                       if post['created_utc'] is not None), None)
+        if complete:
+            self.walks[key] = {'watermark': newest or watermark, 'resume': None}
+        else:
+            self.walks[key] = {'watermark': watermark,
+                               'resume': {'after': posts[-1]['name'], 'newest': newest} if newest else None}
+        return posts
+
+    def fetch_all(self, subreddits, stocks, max_posts_per_stock=None, watermarks=None, resume=None):
+        """{subreddit: {stock: [post, ...]}} for every pair, fetched concurrently.
+
+        watermarks maps (subreddit, stock) to the newest (name, created_utc)
+        collected before; only posts newer than it are fetched. resume maps
+        pairs to their unfinished walks (CollectionState.resume_points).
+        How each pair's walk ended is in self.walks afterwards.
+        """
+        watermarks = watermarks or {}
+        resume = resume or {}
+        pairs = [(subreddit, stock) for subreddit in subreddits for stock in stocks]
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = pool.map(lambda pair: self.fetch_stock(*pair, max_posts_per_stock, watermarks.get(pair),
+                                                               resume.get(pair)),
+                               pairs)
+            stock_posts = {subreddit: {} for subreddit in subreddits}
+            for (subreddit, stock), posts in zip(pairs, results):
+                stock_posts[subreddit][stock] = posts
+        return stock_posts
+
+    def close(self):
+        self.session.close()
+
+
+def make_stub_handler(posts_per_query=250, latency=0.05, throttle_every=0, published=None):
+    """Handler for a local stand-in of /r/<subreddit>/search.json.
+
+    Each query has posts_per_query fake posts plus published['new'] newer
+    ones, newest first, paged with after=<fullname>. Responses take latency
+    seconds; every throttle_every-th request gets a 429 with Retry-After: 1.
+    """
+    counter = {'requests': 0}
+    published = published if published is not None else {'new': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body, headers=()):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            with lock:
+                counter['requests'] += 1
+                n = counter['requests']
+            time.sleep(latency)
+            if throttle_every and n % throttle_every == 0:
+                self._send(429, {'error': 429}, [('Retry-After', '1')])
+                return
+
+            url = urlparse(self.path)
+            subreddit = url.path.split('/')[2]
+            query = parse_qs(url.query)
+            q = query['q'][0]
+            limit = min(int(query.get('limit', [PAGE_SIZE])[0]), PAGE_SIZE)
+            after = query.get('after', [None])[0]
+            # Post k is the k-th oldest; a page lists the limit posts older than after
+            top = int(after.rsplit('_', 1)[1]) - 1 if after else posts_per_query + published['new'] - 1
+            children = [{'kind': 't3', 'data': {
+                'id': f'{subreddit}{q}_{k}', 'name': f't3_{subreddit}{q}_{k}', 'author': 'stub',
+                'title': f'{q} post {k}', 'created_utc': 1700000000 + k * 60,
+            }} for k in range(top, max(top - limit, -1), -1)]
+            self._send(200, {'data': {
+                'children': children,
+                'after': children[-1]['data']['name'] if children and top - limit >= 0 else None,
+            }})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def stub_benchmark(subreddits=3, stocks=10, posts_per_query=250, latency=0.05, rate=50.0, burst=5,
+                   max_workers=8, throttle_every=0, refresh=0):
+    """Collect from a local stub server and compare the time to the rate-limit bound.
+
+    With refresh > 0 the stub then publishes refresh new posts per query and
+    a second run starts from the first run's watermarks.
+    """
+    published = {'new': 0}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0),
+                                make_stub_handler(posts_per_query, latency, throttle_every, published))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    subreddit_names = [f'sub{s}' for s in range(subreddits)]
+    stock_names = [f'stock{s}' for s in range(stocks)]
+
+    def run(watermarks=None):
+        fetcher = RedditFetcher(base_url, rate=rate, burst=burst, max_workers=max_workers, backoff=0.1)
+        start = time.perf_counter()
+        stock_posts = fetcher.fetch_all(subreddit_names, stock_names, watermarks=watermarks)
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+        total = sum(len(posts) for by_stock in stock_posts.values() for posts in by_stock.values())
+        print(f"{total} posts, {fetcher.requests_made} requests ({fetcher.throttled} throttled) in {elapsed:.2f}s")
+        return fetcher.walks, elapsed
+
+    walks, elapsed = run()
+    pages = subreddits * stocks * -(-posts_per_query // PAGE_SIZE)
+    print(f"Rate-limit bound: {max(pages - burst, 0) / rate:.2f}s, sequential latency: {pages * latency:.2f}s")
+
+    if refresh:
+        import tempfile
+        from reddit_state import CollectionState
+
+        with tempfile.TemporaryDirectory() as folder:
+            state = CollectionState(os.path.join(folder, 'state.sqlite'))
+            for (subreddit, stock), walk in walks.items():
+                state.save_walk(subreddit, stock, walk)
+            published['new'] = refresh
+            print(f"Refresh after {refresh} new posts per query:")
+            run(state.watermarks())
+            state.close()
+
+    httpd.shutdown()
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the concurrent fetcher against a local stub of the Reddit search API.")
+    parser.add_argument('--subreddits', type=int, default=3)
+    parser.add_argument('--stocks', type=int, default=10)
+    parser.add_argument('--posts', type=int, default=250, help="Posts per (subreddit, stock) search")
+    parser.add_argument('--latency', type=float, default=0.05, help="Stub response time in seconds")
+    parser.add_argument('--rate', type=float, default=50.0, help="Requests per second")
+    parser.add_argument('--burst', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--throttle-every', type=int, default=0, help="Answer every Nth request with a 429")
+    parser.add_argument('--refresh', type=int, default=0, metavar='N',
+                        help="Then publish N new posts per query and time an incremental run")
+    args = parser.parse_args()
+
+    stub_benchmark(args.subreddits, args.stocks, args.posts, args.latency, args.rate, args.burst,
+                   args.workers, args.throttle_every, args.refresh)
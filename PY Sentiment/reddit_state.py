@@ -0,0 +1,126 @@
+import sqlite3
+
+
+class CollectionState:
+    """Persisted Reddit collection progress.
+
+    watermarks holds the newest post seen per (subreddit, query) as its
+    fullname and created_utc; a later run pages only until it reaches it.
+    seen holds the Reddit ids already stored per ticker, so a post that
+    comes back (re-ordered listing, overlapping runs) is not inserted twice.
+    resume holds, per (subreddit, query), the cursor of a walk that stopped
+    before reaching its watermark and the newest post of that walk; the
+    watermark only moves to that post once the walk is finished.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            " subreddit TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " created_utc REAL NOT NULL,"
+            " PRIMARY KEY (subreddit, query))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS resume ("
+            " subreddit TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " after TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " created_utc REAL NOT NULL,"
+            " PRIMARY KEY (subreddit, query))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " post_id TEXT NOT NULL,"
+            " ticker TEXT NOT NULL,"
+            " PRIMARY KEY (post_id, ticker))"
+        )
+        self.conn.commit()
+
+    def watermark(self, subreddit, query=''):
+        """(name, created_utc) of the newest post already collected, or None."""
+        return self.conn.execute(
+            "SELECT name, created_utc FROM watermarks WHERE subreddit = ? AND query = ?", (subreddit, query)
+        ).fetchone()
+
+    def watermarks(self):
+        return {(subreddit, query): (name, created_utc) for subreddit, query, name, created_utc
+                in self.conn.execute("SELECT subreddit, query, name, created_utc FROM watermarks")}
+
+    def _raise_watermark(self, subreddit, query, name, created_utc):
+        current = self.watermark(subreddit, query)
+        if current is None or created_utc > current[1]:
+            self.conn.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                              (subreddit, query, name, created_utc))
+
+    def advance(self, subreddit, query, posts):
+        """Move the watermark to the newest of posts; older posts never move it back.
+
+        Only for posts of a walk that got down to the previous watermark or
+        to the end of the listing; otherwise the posts in between are lost.
+        """
+        posts = [post for post in posts if post.get('created_utc') is not None]
+        if not posts:
+            return
+        newest = max(posts, key=lambda post: post['created_utc'])
+        self._raise_watermark(subreddit, query, newest['name'], newest['created_utc'])
+        self.conn.commit()
+
+    def resume_points(self):
+        """{(subreddit, query): {'after', 'newest'}} of the walks left unfinished."""
+        return {(subreddit, query): {'after': after, 'newest': (name, created_utc)}
+                for subreddit, query, after, name, created_utc
+                in self.conn.execute("SELECT subreddit, query, after, name, created_utc FROM resume")}
+
+    def save_walk(self, subreddit, query, walk):
+        """Store how a RedditFetcher walk ended: its watermark, and where to resume it if it stopped early."""
+        if walk['watermark'] is not None:
+            self._raise_watermark(subreddit, query, *walk['watermark'])
+        if walk['resume'] is None:
+            self.conn.execute("DELETE FROM resume WHERE subreddit = ? AND query = ?", (subreddit, query))
+        else:
+            self.conn.execute("INSERT OR REPLACE INTO resume VALUES (?, ?, ?, ?, ?)",
+                              (subreddit, query, walk['resume']['after'], *walk['resume']['newest']))
+        self.conn.commit()
+
+    def unseen(self, ticker, posts):
+        """The posts whose Reddit id is not stored for ticker yet, each id once."""
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (post_id TEXT)")
+        cur.execute("DELETE FROM lookup")
+        cur.executemany("INSERT INTO lookup VALUES (?)", ((post['id'],) for post in posts))
+        known = {post_id for post_id, in cur.execute(
+            "SELECT lookup.post_id FROM lookup JOIN seen ON seen.post_id = lookup.post_id AND seen.ticker = ?",
+            (ticker,)
+        )}
+        cur.execute("DELETE FROM lookup")
+
+        fresh = []
+        for post in posts:
+            if post['id'] not in known:
+                known.add(post['id'])
+                fresh.append(post)
+        return fresh
+
+    def stored(self, post_ids):
+        """The ids among post_ids already stored for any ticker."""
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (post_id TEXT)")
+        cur.execute("DELETE FROM lookup")
+        cur.executemany("INSERT INTO lookup VALUES (?)", ((post_id,) for post_id in post_ids))
+        known = {post_id for post_id, in cur.execute(
+            "SELECT DISTINCT lookup.post_id FROM lookup JOIN seen ON seen.post_id = lookup.post_id"
+        )}
+        cur.execute("DELETE FROM lookup")
+        return known
+
+    def mark_seen(self, ticker, posts):
+        self.conn.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?)", ((post['id'], ticker) for post in posts))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
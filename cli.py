@@ -0,0 +1,53 @@
+import os
+import sys
+import runpy
+import argparse
+
+# One entry point for the pipeline scripts:
+#
+#   python cli.py fetch --stocks AAPL MSFT
+#   python cli.py prep --workers 4
+#   python cli.py window --variants avg
+#   python cli.py train --variants avg --epochs 50
+#   python cli.py predict --load-test 2000
+#   python cli.py backtest --step week --output backtest.json
+#
+# Everything after the command goes to that script's own parser, so
+# `python cli.py prep --help` lists prep's options. This module imports only
+# the standard library and runs the one script the command needs, so a
+# command pays only for its own imports (TensorFlow for train and predict);
+# `python -X importtime cli.py window --help` shows what that is.
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (script under root_dir, help)
+COMMANDS = {
+    'fetch': ('PY Sentiment/fetch_posts.py', "Append new Reddit posts to post_data/"),
+    'prep': ('neural_network/dataset_prep/dataset_all.py', "Score the posts and rebuild the feature store"),
+    'update': ('neural_network/dataset_prep/update_features.py',
+               "Add the days after the feature store's last date, and their windows"),
+    'window': ('neural_network/dataset_prep/timeseries.py', "Scale the feature store and write the window stores"),
+    'train': ('neural_network/training/train_runner.py', "Train model variants in parallel"),
+    'predict': ('neural_network/inference_server.py', "Serve the saved models, or load-test them in-process"),
+    'backtest': ('neural_network/backtest.py', "Walk the saved models forward over the window stores"),
+}
+
+
+def run(command, argv):
+    """Run the command's script as __main__ with argv as its arguments."""
+    script = os.path.join(root_dir, COMMANDS[command][0])
+    sys.argv = [script] + list(argv)
+    # The scripts import their neighbours, as when started from their own folder
+    sys.path.insert(0, os.path.dirname(script))
+    runpy.run_path(script, run_name='__main__')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stock-vision pipeline: fetch posts, prep features, "
+                                                 "cut windows, train and serve the models.")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+    for name, (_, help) in COMMANDS.items():
+        commands.add_parser(name, help=help, add_help=False)
+    args, argv = parser.parse_known_args()
+
+    run(args.command, argv)
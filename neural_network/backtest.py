@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+neural_network_dir = os.path.dirname(os.path.abspath(__file__))
+dataset_prep_dir = os.path.join(neural_network_dir, 'dataset_prep')
+sys.path.append(dataset_prep_dir)
+sys.path.append(os.path.join(neural_network_dir, 'training'))
+from feature_store import FeatureStore, store_dir
+from windowing import load_windows, chronological_split
+from inference_server import MODELS, models_dir
+from train_runner import registered_split, registry_path
+
+# Walk-forward backtest of saved models over the window stores. The
+# evaluation date moves through the history one step at a time; each step
+# scores the windows of every ticker whose target day falls in it. Steps
+# are grouped until they hold batch_size windows, each group is cut from
+# the window store once and goes through every model of its variant in
+# one predict call.
+
+# Step name -> NumPy datetime unit the target dates are truncated to
+STEPS = {'week': 'W', 'month': 'M', 'year': 'Y'}
+BACKENDS = ['keras', 'numpy']
+
+
+def model_variant(path):
+    """Feature variant a model file was trained on; models are named {variant}_{architecture}."""
+    name = os.path.basename(path)
+    for variant in sorted(MODELS, key=len, reverse=True):
+        if name.startswith(variant + '_'):
+            return variant
+    raise ValueError(f"Cannot tell the feature variant of {path}; expected {{variant}}_... with one of {list(MODELS)}")
+
+
+def load_predictor(path, backend='keras'):
+    """(input_shape, predict) of a saved model; predict maps (N, sequence_length, n_features) windows to N targets."""
+    if backend == 'numpy':
+        from numpy_inference import NumpyModel
+
+        model = NumpyModel.load(path)
+        return model.input_shape, lambda X: model.predict(X, batch_size=len(X))
+    import keras
+
+    model = keras.models.load_model(path, compile=False)
+    return tuple(model.input_shape[1:]), lambda X: model.predict(X, batch_size=len(X), verbose=0)
+
+
+def step_groups(periods, batch_size):
+    """Window indices grouped by whole steps, each group holding at least batch_size windows (the last may hold fewer)."""
+    order = np.argsort(periods, kind='stable')
+    bounds = np.flatnonzero(np.diff(periods[order].astype(np.int64))) + 1
+    steps = np.split(order, bounds)
+    group = []
+    for indices in steps:
+        group.append(indices)
+        if sum(map(len, group)) >= batch_size:
+            yield np.sort(np.concatenate(group))
+            group = []
+    if group:
+        yield np.sort(np.concatenate(group))
+
+
+def walk_forward(windows, models, step='month', start=None, end=None, batch_size=4096):
+    """(indices, {name: predictions}, {name: seconds}) of the models over the windows, step by step.
+
+    models maps a name to the predict function (load_predictor) of a model
+    of the windows' variant. Only windows whose target date lies in
+    [start, end] are scored. Predictions are in the scaled target units,
+    aligned with indices.
+    """
+    dates = windows.dates
+    keep = np.ones(len(windows), dtype=bool)
+    if start is not None:
+        keep &= dates >= np.datetime64(start, 'D')
+    if end is not None:
+        keep &= dates <= np.datetime64(end, 'D')
+    selected = np.flatnonzero(keep)
+    periods = dates[selected].astype(f'datetime64[{STEPS[step]}]')
+
+    indices, predictions = [], {name: [] for name in models}
+    seconds = dict.fromkeys(models, 0.0)
+    for group in step_groups(periods, batch_size):
+        batch = selected[group]
+        X = windows[batch].astype(np.float32, copy=False)
+        indices.append(batch)
+        for name, predict in models.items():
+            start_time = time.perf_counter()
+            predicted = predict(X)
+            seconds[name] += time.perf_counter() - start_time
+            predictions[name].append(np.asarray(predicted, dtype=np.float64).reshape(-1))
+    if not indices:
+        return np.empty(0, dtype=np.int64), {name: np.empty(0) for name in models}, seconds
+    return np.concatenate(indices), {name: np.concatenate(p) for name, p in predictions.items()}, seconds
+
+
+def score(results, by):
+    """Metrics of the results frame per group of the `by` columns.
+
+    rmse and rmse_zero (of always predicting a zero return) are in log
+    return units; directional_accuracy is the share of windows whose
+    predicted and actual returns have the same sign.
+    """
+    rows = results.assign(squared_error=(results['predicted'] - results['actual']) ** 2,
+                          squared_zero=results['actual'] ** 2,
+                          hit=np.sign(results['predicted']) == np.sign(results['actual']))
+    table = rows.groupby(by, observed=True).agg(windows=('hit', 'size'), rmse=('squared_error', 'mean'),
+                                                rmse_zero=('squared_zero', 'mean'),
+                                                directional_accuracy=('hit', 'mean'))
+    table['rmse'] = np.sqrt(table['rmse'])
+    table['rmse_zero'] = np.sqrt(table['rmse_zero'])
+    return table.reset_index()
+
+
+def backtest(model_paths, step='month', start=None, end=None, batch_size=4096, backend='keras',
+             dataset_prep_dir=dataset_prep_dir, store_dir=store_dir, registry_path=registry_path):
+    """Walk every model forward over its variant's window store; returns (results, report).
+
+    results has one row per (model, window): ticker, target date, step,
+    actual and predicted log return, and whether the window was held out
+    of training (the val and test parts of the chronological split the
+    model was trained with). Only models in train_runner's registry have a
+    known split; for the others held_out is <NA>. report holds the score()
+    tables per model, per (model, ticker) and per (model, step), plus
+    predict throughput.
+    """
+    store = FeatureStore(store_dir)
+    by_variant = {}
+    for path in model_paths:
+        by_variant.setdefault(model_variant(path), []).append(path)
+
+    frames, throughput, unknown_split = [], {}, []
+    for variant, paths in by_variant.items():
+        windows = load_windows(os.path.join(dataset_prep_dir, f'all_{variant}'), variant)
+        models, splits = {}, {}
+        for path in paths:
+            name = os.path.basename(path)
+            input_shape, models[name] = load_predictor(path, backend)
+            splits[name] = registered_split(path, registry_path)
+            if splits[name] is None:
+                unknown_split.append(name)
+            if input_shape != windows.shape[1:]:
+                raise ValueError(f"{os.path.basename(path)} takes windows of shape {input_shape}, "
+                                 f"the {variant} store holds {windows.shape[1:]}")
+
+        indices, predictions, seconds = walk_forward(windows, models, step, start, end, batch_size)
+        # The target is the scaled LogReturn_Close, the first feature column
+        scaler = store.load_scaler(variant)
+        mean, scale = scaler.mean_[0], scaler.scale_[0]
+        tickers = store.tickers(variant)
+        names = np.array([tickers[i] if i < len(tickers) else f'Stock_{i}' for i in range(windows.labels.max() + 1)])
+        for name in models:
+            held_out = pd.array([pd.NA] * len(indices), dtype='boolean')
+            if splits[name] is not None:
+                train = np.zeros(len(windows), dtype=bool)
+                train[chronological_split(windows, **splits[name])['train']] = True
+                held_out = pd.array(~train[indices], dtype='boolean')
+            frames.append(pd.DataFrame({
+                'model': name,
+                'ticker': names[windows.labels[indices]],
+                'date': windows.dates[indices].astype('datetime64[s]'),
+                'step': windows.dates[indices].astype(f'datetime64[{STEPS[step]}]').astype(str),
+                'actual': windows.y[indices].astype(np.float64) * scale + mean,
+                'predicted': predictions[name] * scale + mean,
+                'held_out': held_out,
+            }))
+            throughput[name] = {'windows': len(indices), 'predict_s': round(seconds[name], 3),
+                                'windows_per_s': round(len(indices) / seconds[name], 1) if seconds[name] else None}
+
+    results = pd.concat(frames, ignore_index=True)
+    for column in ['model', 'ticker']:
+        results[column] = results[column].astype('category')
+    held = results[results['held_out'].fillna(False).astype(bool)]
+    report = {
+        'step': step,
+        'backend': backend,
+        'unknown_split': unknown_split,
+        'throughput': throughput,
+        'models': score(results, ['model']).to_dict('records'),
+        'models_held_out': score(held, ['model']).to_dict('records'),
+        'tickers': score(results, ['model', 'ticker']).to_dict('records'),
+        'tickers_held_out': score(held, ['model', 'ticker']).to_dict('records'),
+        'steps': score(results, ['model', 'step']).to_dict('records'),
+    }
+    return results, report
+
+
+def print_report(report):
+    for key, title in [('models', 'All windows'), ('models_held_out', 'Held-out windows (val + test)'),
+                       ('tickers_held_out', 'Held-out windows per ticker')]:
+        print(f"\n{title}:")
+        if not report[key]:
+            print("  none, no model has a known training split")
+            continue
+        print(pd.DataFrame(report[key]).to_string(index=False, float_format='{:.4f}'.format))
+    if report['unknown_split']:
+        print(f"\nNot in the training registry, so their held-out windows are unknown: {', '.join(report['unknown_split'])}")
+    print("\nPredict throughput:")
+    for name, stats in report['throughput'].items():
+        print(f"  {name}: {stats['windows']} windows in {stats['predict_s']:.2f}s ({stats['windows_per_s']} windows/s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the saved models over the window stores.")
+    parser.add_argument('--models', nargs='+', default=[os.path.join(models_dir, name) for name in MODELS.values()],
+                        help="Saved .keras models, named {variant}_{architecture}... (default: the committed ones)")
+    parser.add_argument('--step', choices=list(STEPS), default='month', help="How far the evaluation date moves per step")
+    parser.add_argument('--start', help="First target date to score")
+    parser.add_argument('--end', help="Last target date to score")
+    parser.add_argument('--batch-size', type=int, default=4096, help="Windows per predict call")
+    parser.add_argument('--backend', choices=BACKENDS, default='keras',
+                        help="Keras, or numpy_inference's TensorFlow-free forward pass")
+    parser.add_argument('--dataset-prep-dir', default=dataset_prep_dir,
+                        help="Folder holding the all_{variant} window stores")
+    parser.add_argument('--store', default=store_dir, help="Feature store folder (scalers and ticker names)")
+    parser.add_argument('--registry', default=registry_path,
+                        help="train_runner's registry, which tells the split each model was trained with")
+    parser.add_argument('--output', help="JSON report with the per-model, per-ticker and per-step tables")
+    parser.add_argument('--predictions', help="CSV with every (model, window) prediction")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results, report = backtest(args.models, args.step, args.start, args.end, args.batch_size, args.backend,
+                               args.dataset_prep_dir, args.store, args.registry)
+    print_report(report)
+    print(f"\n{len(results)} predictions in {time.perf_counter() - start:.1f}s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1, default=str)
+        print(f"Wrote {args.output}")
+    if args.predictions:
+        results.to_csv(args.predictions, index=False)
+        print(f"Wrote {args.predictions}")
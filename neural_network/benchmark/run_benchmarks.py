@@ -0,0 +1,272 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+neural_network_dir = os.path.dirname(benchmark_dir)
+dataset_prep_dir = os.path.join(neural_network_dir, 'dataset_prep')
+training_dir = os.path.join(neural_network_dir, 'training')
+models_dir = os.path.join(neural_network_dir, 'models')
+results_dir = os.path.join(benchmark_dir, 'results')
+sys.path.append(dataset_prep_dir)
+sys.path.append(training_dir)
+
+from synthetic_data import STOCKS, write_dataset
+from ingest import IngestCache
+from sentiment_scoring import score_texts
+from daily_sentiment import AVG_COLS, RATIO_COLS, daily_sentiment_table, ticker_slices
+from timeseries import FEATURE_COLS, timeseries_frame
+from windowing import make_windows
+import schema
+
+STAGES = ['ingest', 'sentiment_scoring', 'daily_aggregation', 'windowing', 'training_epoch', 'predict']
+
+
+def _commit():
+    # HEAD and whether the tree has uncommitted changes, or None outside a git checkout
+    try:
+        head = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=benchmark_dir, capture_output=True, text=True,
+                              check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=benchmark_dir,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return head, bool(status.strip())
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class Suite:
+    """Runs the prep, windowing, training and inference stages on one synthetic dataset.
+
+    Each stage feeds the next (scores -> daily table -> windows), so they
+    must run in STAGES order; results[stage] holds its timings.
+    """
+
+    def __init__(self, data_root, work_dir, variant='avg_ratio', workers=1, chunksize=256):
+        self.data_root = data_root
+        self.work_dir = work_dir
+        self.variant = variant
+        self.workers = workers
+        self.chunksize = chunksize
+        self.results = {}
+
+    def ingest(self):
+        # First read converts the CSVs to the Parquet cache, the second one only reads it
+        cache_dir = os.path.join(self.work_dir, 'ingest_cache')
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+        def read():
+            ingest = IngestCache(self.data_root, cache_dir)
+            posts = ingest.read_posts(['id', 'title', 'selftext', 'created_utc'])
+            stock_index = schema.conform(ingest.read_stock_index(['id', 'stock_symbol']))
+            prices = {stock: ingest.read_prices(stock, ['Date', 'Open', 'High', 'Low', 'Close', 'Volume'])
+                      for stock in STOCKS}
+            return posts, stock_index, prices
+
+        _, convert_s = _timed(read)
+        (self.posts, self.stock_index, self.prices), read_s = _timed(read)
+        return {'posts': len(self.posts), 'convert_s': convert_s, 'cached_read_s': read_s}
+
+    def sentiment_scoring(self):
+        texts = (self.posts['title'] + '. ' + self.posts['selftext'].fillna('')).tolist()
+        self.scores, elapsed = _timed(score_texts, texts, workers=self.workers, chunksize=self.chunksize)
+        return {'posts': len(texts), 'workers': self.workers, 'seconds': elapsed, 'posts_per_s': len(texts) / elapsed}
+
+    def daily_aggregation(self):
+        scored = pd.DataFrame(self.scores.astype(schema.FLOAT), columns=['pos', 'neg', 'neu'])
+        scored['id'] = self.posts['id'].to_numpy()
+        posts_df = self.stock_index.merge(
+            scored.merge(self.posts[['id', 'created_utc']], on='id'), on='id')
+        posts_df['Date'] = schema.frame_dates(posts_df['created_utc']).to_numpy()
+        self.daily_table, elapsed = _timed(daily_sentiment_table, posts_df)
+        return {'rows': len(posts_df), 'stock_days': len(self.daily_table), 'seconds': elapsed,
+                'rows_per_s': len(posts_df) / elapsed}
+
+    def windowing(self):
+        # The timeseries notebooks' frames: prices with the day's sentiment, log returns, int16 stock labels.
+        # Same columns as dataset_all.VARIANT_COLS
+        columns = {'avg': AVG_COLS, 'ratio': RATIO_COLS, 'avg_ratio': AVG_COLS + RATIO_COLS}[self.variant]
+        daily_by_stock = ticker_slices(self.daily_table)
+        frames = []
+        for i, stock in enumerate(STOCKS):
+            prices = schema.conform(self.prices[stock])
+            daily = daily_by_stock.get(stock, self.daily_table.iloc[0:0])[['Date'] + columns]
+            frames.append(timeseries_frame(prices.merge(daily, on='Date', how='left'), i))
+        combined = pd.concat(frames, ignore_index=True)
+
+        def build():
+            windows = make_windows(combined, FEATURE_COLS[self.variant])
+            return windows, windows.to_array()
+
+        (self.windows, X), elapsed = _timed(build)
+        return {'rows': len(combined), 'windows': len(self.windows), 'shape': list(X.shape[1:]),
+                'seconds': elapsed, 'windows_per_s': len(self.windows) / elapsed}
+
+    def training_epoch(self, architecture='lstm', batch_size=32, epochs=2):
+        """Per-epoch times of train_runner's model on training_data's pipeline; the first includes tracing."""
+        import tensorflow as tf
+        from train_runner import build_model
+        from training_data import make_dataset
+
+        tf.keras.utils.set_random_seed(0)
+        indices = np.arange(len(self.windows))
+        dataset = make_dataset(self.windows, indices, batch_size, shuffle_buffer=2048)
+        model = build_model(architecture, self.windows.shape[1:])
+
+        epoch_times = []
+
+        class EpochTimer(tf.keras.callbacks.Callback):
+            def on_epoch_begin(self, epoch, logs=None):
+                self.start = time.perf_counter()
+
+            def on_epoch_end(self, epoch, logs=None):
+                epoch_times.append(time.perf_counter() - self.start)
+
+        model.fit(dataset, epochs=epochs, callbacks=[EpochTimer()], verbose=0)
+        return {'architecture': architecture, 'windows': len(indices), 'batch_size': batch_size,
+                'epoch_s': epoch_times, 'windows_per_s': len(indices) / epoch_times[-1]}
+
+    def predict(self, models=None, latency_calls=50, throughput_windows=4096, batch_size=1024):
+        """predict() latency for one window and throughput for batch_size windows, per saved model."""
+        import tensorflow as tf
+
+        rng = np.random.default_rng(0)
+        results = {}
+        for path in models or sorted(glob.glob(os.path.join(models_dir, '*.keras'))):
+            model = tf.keras.models.load_model(path)
+            shape = model.input_shape[1:]
+            one = rng.normal(size=(1, *shape)).astype(np.float32)
+            many = rng.normal(size=(throughput_windows, *shape)).astype(np.float32)
+
+            model.predict(one, verbose=0)
+            latencies = []
+            for _ in range(latency_calls):
+                _, elapsed = _timed(model.predict, one, verbose=0)
+                latencies.append(elapsed * 1000)
+
+            model.predict(many[:batch_size], batch_size=batch_size, verbose=0)
+            _, elapsed = _timed(model.predict, many, batch_size=batch_size, verbose=0)
+            results[os.path.basename(path)] = {
+                'input_shape': list(shape),
+                'latency_ms_p50': float(np.percentile(latencies, 50)),
+                'latency_ms_p95': float(np.percentile(latencies, 95)),
+                'throughput_windows_per_s': throughput_windows / elapsed,
+            }
+        return results
+
+    def run(self, stages=STAGES, **stage_kwargs):
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            print(f"{stage}...", flush=True)
+            self.results[stage] = getattr(self, stage)(**stage_kwargs.get(stage, {}))
+            print(f"  {json.dumps(self.results[stage])}")
+        return self.results
+
+
+def run_benchmarks(n_posts=20000, n_days=1250, seed=0, variant='avg_ratio', workers=1, stages=STAGES,
+                   training_epochs=2, architecture='lstm', output=None, work_dir=None):
+    """Generate the synthetic dataset, run the stages and write the JSON report.
+
+    The report carries the commit, machine and dataset scale next to the
+    results, so reports of different commits can be compared with --compare.
+    """
+    # Every stage needs the output of the stages before it
+    stages = STAGES[:max(STAGES.index(stage) for stage in stages) + 1]
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='stock_vision_bench_')
+    try:
+        data_root = os.path.join(work_dir, 'data')
+        _, generate_s = _timed(write_dataset, data_root, n_posts, STOCKS, n_days, seed=seed)
+        suite = Suite(data_root, work_dir, variant, workers)
+        results = suite.run(stages, training_epoch={'architecture': architecture, 'epochs': training_epochs})
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit, dirty = _commit()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__},
+        'dataset': {'posts': n_posts, 'stocks': len(STOCKS), 'days': n_days, 'seed': seed, 'variant': variant,
+                    'generate_s': generate_s},
+        'results': results,
+    }
+    if 'training_epoch' in results or 'predict' in results:
+        import tensorflow as tf
+        report['machine']['tensorflow'] = tf.__version__
+
+    output = output or os.path.join(results_dir, f"{(commit or 'nocommit')[:10]}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Wrote {output}")
+    return report
+
+
+def _flatten(results, prefix=''):
+    # {'predict': {'x.keras': {'latency_ms_p50': 1.0}}} -> {'predict.x.keras.latency_ms_p50': 1.0}
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f'{prefix}{key}'] = value
+        elif isinstance(value, list) and value and all(isinstance(v, float) for v in value):
+            flat[f'{prefix}{key}'] = value[-1]
+    return flat
+
+
+def compare(baseline_path, report_path):
+    """Print every timing and rate of two reports side by side with new / old."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(report_path) as f:
+        report = json.load(f)
+    old, new = _flatten(baseline['results']), _flatten(report['results'])
+    print(f"{'metric':60s} {(baseline['commit'] or '-')[:10]:>12s} {(report['commit'] or '-')[:10]:>12s}  new/old")
+    for key in old:
+        if key in new and old[key]:
+            print(f"{key:60s} {old[key]:12.4g} {new[key]:12.4g}  {new[key] / old[key]:6.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic data and write a JSON report.")
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=1250, help="Business days of prices per stock")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--variant', choices=list(FEATURE_COLS), default='avg_ratio')
+    parser.add_argument('--workers', type=int, default=1, help="Sentiment scoring processes")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                        help="Run up to the last of these (earlier stages feed it)")
+    parser.add_argument('--training-epochs', type=int, default=2)
+    parser.add_argument('--architecture', default='lstm')
+    parser.add_argument('--output', help="Report path (default: results/{commit}.json)")
+    parser.add_argument('--work-dir', help="Keep the synthetic data and caches here instead of a temp folder")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'REPORT'), help="Compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run_benchmarks(args.posts, args.days, args.seed, args.variant, args.workers, args.stages,
+                       args.training_epochs, args.architecture, args.output, args.work_dir)
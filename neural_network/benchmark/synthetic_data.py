@@ -0,0 +1,118 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+dataset_prep_dir = os.path.join(os.path.dirname(benchmark_dir), 'dataset_prep')
+sys.path.append(dataset_prep_dir)
+from sentiment_scoring import benchmark_texts
+from ticker_matcher import COMPANIES
+from schema import POST_COLUMNS, STOCK_INDEX_COLUMNS
+
+STOCKS = ['AAPL', 'GME', 'MCD', 'MSFT', 'NFLX', 'NVDA', 'TSLA']
+SUBREDDITS = ['wallstreetbets', 'stocks', 'investing', 'StockMarket']
+
+# Column layout of the real price_data/ CSVs; the post_data/ ones are schema's
+PRICE_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+
+def make_prices(stock, n_days=1250, start='2018-01-01', seed=0):
+    """Daily OHLCV of one stock over n_days business days, as price_data/{stock}.csv has it.
+
+    Close is a geometric random walk; Date is midnight New York time with
+    its UTC offset, like the yfinance exports.
+    """
+    rng = np.random.default_rng([seed, sum(map(ord, stock))])
+    dates = pd.bdate_range(start, periods=n_days).tz_localize('America/New_York')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+    spread = np.abs(rng.normal(0, 0.01, n_days))
+    return pd.DataFrame({
+        'Date': dates,
+        'Open': close * (1 + rng.normal(0, 0.005, n_days)),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 10_000_000, n_days),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    })[PRICE_COLUMNS]
+
+
+def make_posts(n_posts=20000, stocks=STOCKS, start='2018-01-01', end='2022-12-31', seed=0):
+    """(posts, stock_index) frames with the posts.csv and stock_index.csv columns.
+
+    Every post names one of the stocks in its title and a quarter of them a
+    second one; stock_index has a row per (post, stock). Titles and bodies
+    are sentiment_scoring.benchmark_texts, a third of the bodies are empty.
+    """
+    rng = np.random.default_rng(seed)
+    start_s = int(pd.Timestamp(start).timestamp())
+    end_s = int((pd.Timestamp(end) + pd.Timedelta(days=1)).timestamp())
+    created_utc = np.sort(rng.integers(start_s, end_s, n_posts))
+    # Reddit-style base-36 ids from 'a00000' on, so none of them reads back as a number
+    ids = [np.base_repr(10 * 36 ** 5 + k, 36).lower() for k in range(n_posts)]
+
+    first = rng.integers(0, len(stocks), n_posts)
+    second = np.where(rng.random(n_posts) < 0.25, (first + rng.integers(1, len(stocks), n_posts)) % len(stocks), -1)
+    titles = [' '.join(text.split()[:12]) for text in benchmark_texts(n_posts, seed)]
+    titles = [f"{COMPANIES.get(stocks[a], [stocks[a]])[0]} {title}" + (f" ${stocks[b]}" if b >= 0 else '')
+              for a, b, title in zip(first, second, titles)]
+    bodies = np.array(benchmark_texts(n_posts, seed + 1), dtype=object)
+    bodies[rng.random(n_posts) < 1 / 3] = None
+
+    subreddits = np.array(SUBREDDITS)[rng.integers(0, len(SUBREDDITS), n_posts)]
+    permalinks = [f"/r/{subreddit}/comments/{post_id}/" for subreddit, post_id in zip(subreddits, ids)]
+    posts = pd.DataFrame({
+        'id': ids,
+        'title': titles,
+        'selftext': bodies,
+        'subreddit': subreddits,
+        'author': [f"user{k}" for k in rng.integers(0, max(1, n_posts // 20), n_posts)],
+        'permalink': permalinks,
+        'url': [f"https://www.reddit.com{permalink}" for permalink in permalinks],
+        'created_utc': created_utc,
+    })[POST_COLUMNS]
+
+    rows = np.r_[np.arange(n_posts), np.flatnonzero(second >= 0)]
+    symbols = np.r_[first, second[second >= 0]]
+    order = np.argsort(rows, kind='stable')
+    stock_index = pd.DataFrame({
+        'id': np.asarray(ids)[rows[order]],
+        'stock_symbol': np.array(stocks)[symbols[order]],
+        'created_utc': created_utc[rows[order]],
+    })[STOCK_INDEX_COLUMNS]
+    return posts, stock_index
+
+
+def write_dataset(data_root, n_posts=20000, stocks=STOCKS, n_days=1250, start='2018-01-01', seed=0):
+    """Write post_data/posts.csv, post_data/stock_index.csv and price_data/{stock}.csv under data_root.
+
+    The same arguments always give byte-identical files. Posts span the
+    price days, so every business day has prices and most have posts.
+    """
+    os.makedirs(os.path.join(data_root, 'post_data'), exist_ok=True)
+    os.makedirs(os.path.join(data_root, 'price_data'), exist_ok=True)
+    end = pd.bdate_range(start, periods=n_days)[-1]
+    posts, stock_index = make_posts(n_posts, stocks, start, end, seed)
+    posts.to_csv(os.path.join(data_root, 'post_data', 'posts.csv'), index=False)
+    stock_index.to_csv(os.path.join(data_root, 'post_data', 'stock_index.csv'), index=False)
+    for stock in stocks:
+        make_prices(stock, n_days, start, seed).to_csv(os.path.join(data_root, 'price_data', f'{stock}.csv'),
+                                                       index=False)
+    return data_root
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic post_data/ and price_data/ tree.")
+    parser.add_argument('data_root', help="Folder to create post_data/ and price_data/ in")
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--stocks', nargs='+', default=STOCKS)
+    parser.add_argument('--days', type=int, default=1250, help="Business days of prices per stock")
+    parser.add_argument('--start', default='2018-01-01')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_dataset(args.data_root, args.posts, args.stocks, args.days, args.start, args.seed)
+    print(f"Wrote {args.posts} posts and {args.days} days of prices for {len(args.stocks)} stocks to {args.data_root}")
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+import schema
+
+AVG_COLS = ['average_pos', 'average_neg', 'average_neu']
+RATIO_COLS = ['positive_ratio', 'negative_ratio', 'neutral_ratio']
+
+# Category codes, in the order of RATIO_COLS
+POSITIVE, NEGATIVE, NEUTRAL = 0, 1, 2
+
+
+def categorize(pos, neg, neu):
+    """Vectorized categorize_sentiment: int8 codes POSITIVE/NEGATIVE/NEUTRAL.
+
+    A score has to be strictly larger than both others to win, so every tie
+    falls through to neutral exactly like the row-wise version.
+    """
+    pos, neg, neu = np.asarray(pos), np.asarray(neg), np.asarray(neu)
+    codes = np.full(len(pos), NEUTRAL, dtype=np.int8)
+    codes[(neg > pos) & (neg > neu)] = NEGATIVE
+    codes[(pos > neg) & (pos > neu)] = POSITIVE
+    return codes
+
+
+def daily_sentiment_table(posts_df):
+    """Daily average_* and *_ratio features for every (stock_symbol, Date).
+
+    posts_df needs 'stock_symbol', 'Date', 'pos', 'neg' and 'neu'. Symbols are
+    upper-cased. The result is sorted by (stock_symbol, Date) with a
+    RangeIndex, so each ticker is one contiguous block of rows, and has the
+    schema.COLUMNS dtypes. Posts without a symbol or a Date are left out.
+    """
+    grouped = pd.DataFrame({
+        'stock_symbol': posts_df['stock_symbol'].str.upper().to_numpy(),
+        'Date': posts_df['Date'].to_numpy(),
+        'pos': posts_df['pos'].to_numpy(),
+        'neg': posts_df['neg'].to_numpy(),
+        'neu': posts_df['neu'].to_numpy(),
+    }).groupby(['stock_symbol', 'Date'], sort=True)
+
+    table = grouped[['pos', 'neg', 'neu']].mean()
+    table.columns = AVG_COLS
+
+    # Category counts per group from one bincount over (group, category)
+    group_ids = grouped.ngroup().to_numpy()
+    codes = categorize(posts_df['pos'], posts_df['neg'], posts_df['neu'])
+    # groupby drops rows with a null key; ngroup numbers them NaN (-1 in older pandas)
+    keyed = group_ids >= 0
+    counts = np.bincount(group_ids[keyed].astype(np.int64) * 3 + codes[keyed],
+                         minlength=len(table) * 3).reshape(-1, 3)
+    ratios = counts / counts.sum(axis=1, keepdims=True)
+    for i, col in enumerate(RATIO_COLS):
+        table[col] = ratios[:, i]
+
+    return schema.conform(table.reset_index())
+
+
+def ticker_slices(table):
+    """Map each stock_symbol to its rows of a daily_sentiment_table, without copying."""
+    symbols = table['stock_symbol'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]]) if len(symbols) else []
+    stops = list(starts[1:]) + [len(symbols)]
+    return {symbols[start]: table.iloc[start:stop] for start, stop in zip(starts, stops)}
@@ -0,0 +1,243 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from multiprocessing import cpu_count
+
+from sentiment_scoring import score_texts
+from ingest import IngestCache
+from feature_store import FeatureStore, store_dir
+from sentiment_cache import SentimentCache, text_hash
+from daily_sentiment import AVG_COLS, RATIO_COLS, daily_sentiment_table, ticker_slices
+import dedup
+import schema
+import instrumentation
+from instrumentation import stage
+
+stocks = ['AAPL','GME', 'MCD', 'MSFT', 'NFLX', 'NVDA', 'TSLA']
+
+# Feature variants (folder/suffix they are written with) and their sentiment columns
+VARIANT_COLS = {
+    'avg': AVG_COLS,
+    'ratio': RATIO_COLS,
+    'avg_ratio': AVG_COLS + RATIO_COLS,
+}
+VARIANTS = list(VARIANT_COLS)
+
+dataset_prep_dir = os.path.dirname(os.path.abspath(__file__))
+data_root = os.path.dirname(os.path.dirname(dataset_prep_dir))
+
+cache_path = os.path.join(dataset_prep_dir, 'sentiment_cache.sqlite')
+ingest_cache_dir = os.path.join(dataset_prep_dir, 'ingest_cache')
+
+start_date = pd.to_datetime('2018-01-01').date()
+end_date = pd.to_datetime('2022-12-31').date()
+# Exclusive timestamp bound for reads, so every post/price on end_date is kept
+end_timestamp = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+
+
+def load_post_stock(ingest, start=start_date, end=end_timestamp):
+    """Posts with start <= created_utc < end merged with stock_index on post id."""
+    with stage('read_posts') as s:
+        all_posts_df = ingest.read_posts(['id', 'title', 'selftext', 'created_utc'], start, end)
+        s.rows = len(all_posts_df)
+    with stage('read_stock_index') as s:
+        stock_index_df = schema.conform(ingest.read_stock_index(['id', 'stock_symbol']))
+        s.rows = len(stock_index_df)
+
+    with stage('merge_posts') as s:
+        #merging on basis of id
+        post_stock_df= pd.merge(all_posts_df, stock_index_df, on=['id'], how='inner')
+
+        post_stock_df=post_stock_df.rename(columns={'created_utc': 'created_at'})
+        post_stock_df=post_stock_df.sort_values(by=['stock_symbol','created_at'])
+        s.rows = len(post_stock_df)
+    return post_stock_df
+
+
+def load_prices(ingest, stock, start=start_date, end=end_timestamp):
+    """Prices of one stock with start <= Date < end, by default the 2018-2022 window."""
+    with stage('read_prices', ticker=stock) as s:
+        price_df = ingest.read_prices(stock, ['Date', 'Open', 'High', 'Low', 'Close', 'Volume'], start, end)
+
+        # UTC days, float32 prices
+        price_df = schema.conform(price_df)
+        s.rows = len(price_df)
+    return price_df
+
+
+def score_posts(post_stock_df, stocks, cache=None, workers=None, chunksize=256, dedup_mode='off',
+                dedup_threshold=dedup.THRESHOLD):
+    """Score every unique post of the given stocks once.
+
+    stock_index.csv can map one post to several symbols; those rows share a
+    post id and text, so they are scored once here in a single pool and
+    joined back per stock. With dedup_mode 'exact' or 'near', cross-posts
+    and near-duplicates are clustered first and only the first post of each
+    cluster is scored; the others get its scores. Returns a frame of
+    pos/neg/neu and the cluster's first post id, indexed by id.
+    """
+    symbols = post_stock_df['stock_symbol'].str.upper()
+    unique_df = post_stock_df[symbols.isin([stock.upper() for stock in stocks])].drop_duplicates('id')
+    unique_df = unique_df[['id', 'title', 'selftext']].copy()
+    print(f"Scoring {len(unique_df)} unique posts for {len(stocks)} stocks")
+
+    # Replace NaN values in the 'selftext' column with an empty string
+    unique_df['selftext'] = unique_df['selftext'].fillna('')
+
+    #merging title and selftext
+    unique_df['text'] = unique_df['title'] + '. ' + unique_df['selftext']
+
+    if dedup_mode == 'off':
+        scored_df = parallel_sentiment_analysis(unique_df[['id', 'text']], 'text', cache, workers, chunksize)
+        scored_df['cluster'] = scored_df['id']
+        return scored_df.drop(columns=['text']).set_index('id')
+
+    with stage('dedup', rows=len(unique_df)):
+        rep, stats = dedup.duplicate_clusters(unique_df['text'].tolist(), dedup_mode, dedup_threshold, workers=workers)
+    dedup.report(stats)
+    first = np.unique(rep)
+    scored = parallel_sentiment_analysis(unique_df[['id', 'text']].iloc[first], 'text', cache, workers, chunksize)
+
+    # Fan the first posts' scores out to their clusters
+    ids = unique_df['id'].to_numpy()
+    scored_df = pd.DataFrame(scored[['pos', 'neg', 'neu']].to_numpy()[np.searchsorted(first, rep)],
+                             columns=['pos', 'neg', 'neu'])
+    scored_df.insert(0, 'id', ids)
+    scored_df['cluster'] = ids[rep]
+    return scored_df.set_index('id')
+
+
+def stock_posts(post_stock_df, stocks, scored_df):
+    """Posts of the given stocks with a 'Date' column, their pos/neg/neu scores and cluster."""
+    symbols = post_stock_df['stock_symbol'].str.upper()
+    posts_df = post_stock_df.loc[symbols.isin([stock.upper() for stock in stocks]), ['id', 'stock_symbol', 'created_at']]
+    posts_df = posts_df.reset_index(drop=True)
+    posts_df['Date'] = schema.frame_dates(posts_df['created_at']).to_numpy()
+
+    scored = scored_df.loc[posts_df['id']]
+    posts_df[['pos', 'neg', 'neu']] = scored[['pos', 'neg', 'neu']].to_numpy(schema.FLOAT)
+    posts_df['cluster'] = scored['cluster'].to_numpy()
+    return posts_df.drop(columns=['created_at'])
+
+
+# Parallel sentiment analysis with progress bar
+def parallel_sentiment_analysis(df, text_column, cache=None, workers=None, chunksize=256):
+    texts = df[text_column].tolist()  # Extract the text column as a list
+    scores = np.empty((len(texts), 3), dtype=np.float64)
+    missing = np.ones(len(texts), dtype=bool)
+
+    # Only cache misses are sent to the pool
+    if cache is not None:
+        with stage('sentiment_cache_lookup', rows=len(texts)):
+            ids = df['id'].tolist()
+            hashes = [text_hash(text) for text in texts]
+            for idx, cached in cache.get_many(ids, hashes).items():
+                scores[idx] = cached
+                missing[idx] = False
+    missing = np.flatnonzero(missing)
+
+    if len(missing):
+        print(f"Using {workers or cpu_count()} CPU cores for {len(missing)} of {len(texts)} posts")
+        with stage('sentiment_scoring', rows=len(missing)):
+            scored = score_texts([texts[idx] for idx in missing], workers=workers, chunksize=chunksize, progress=True)
+        scores[missing] = scored
+
+        if cache is not None:
+            with stage('sentiment_cache_write', rows=len(missing)):
+                cache.put_many([ids[idx] for idx in missing], [hashes[idx] for idx in missing], scored)
+
+    # Convert the results into a DataFrame
+    sentiment_df = pd.DataFrame(scores, columns=['pos', 'neg', 'neu'])
+    return pd.concat([df.reset_index(drop=True), sentiment_df], axis=1)
+
+
+def build_variant(variant, price_df_filtered, daily_df):
+    """Merge one variant's daily sentiment columns onto the price frame."""
+    sentiments = daily_df[['Date'] + VARIANT_COLS[variant]]
+
+    #Merging and creating
+    return pd.merge(price_df_filtered, sentiments, on='Date', how='left')
+
+
+def build_features(stocks=stocks, variants=VARIANTS, data_root=data_root, store_dir=store_dir,
+                   cache_path=cache_path, cache_max_age_days=30, workers=None, chunksize=256,
+                   ingest_cache_dir=ingest_cache_dir, dedup_mode='off', duplicates='count',
+                   dedup_threshold=dedup.THRESHOLD):
+    """Score every post once and write each requested variant.
+
+    Replaces the (variant, stock) rows of the feature store at store_dir. Scores are
+    kept in the SQLite cache at cache_path so later runs only score new or
+    edited posts; pass cache_path=None to score everything. The CSV inputs
+    are read through the Parquet copies in ingest_cache_dir. dedup_mode
+    and dedup_threshold pick the duplicate clustering ahead of scoring
+    (dedup.duplicate_clusters); duplicates='collapse' then counts each
+    cluster once per stock and day in the daily features.
+    """
+    for variant in variants:
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown feature variant: {variant}")
+    if duplicates not in dedup.POLICIES:
+        raise ValueError(f"Unknown duplicates policy: {duplicates}")
+
+    store = FeatureStore(store_dir)
+    ingest = IngestCache(data_root, ingest_cache_dir)
+    post_stock_df = load_post_stock(ingest)
+    cache = SentimentCache(cache_path, cache_max_age_days) if cache_path else None
+
+    scored_df = score_posts(post_stock_df, stocks, cache, workers, chunksize, dedup_mode, dedup_threshold)
+
+    # Daily features for every ticker in one grouped pass
+    with stage('daily_aggregation') as s:
+        posts_df = stock_posts(post_stock_df, stocks, scored_df)
+        if duplicates == 'collapse':
+            posts_df = dedup.collapse_duplicates(posts_df)
+        daily_table = daily_sentiment_table(posts_df)
+        daily_by_stock = ticker_slices(daily_table)
+        s.rows = len(posts_df)
+
+    for stock in stocks:
+        print(f"Processing {stock} data")
+        price_df_filtered = load_prices(ingest, stock)
+        daily_df = daily_by_stock.get(stock.upper(), daily_table.iloc[0:0])
+
+        for variant in variants:
+            with stage('build_variant', ticker=stock, variant=variant) as s:
+                merged_df = build_variant(variant, price_df_filtered, daily_df)
+                s.rows = len(merged_df)
+            with stage('store_write', ticker=stock, variant=variant, rows=len(merged_df)):
+                store.write(variant, stock, merged_df)
+
+    if cache is not None:
+        with stage('sentiment_cache_evict'):
+            evicted = cache.evict()
+        cache.report()
+        print(f"Evicted {evicted} stale cache entries")
+        cache.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the avg, ratio and avg_ratio rows of the feature store.")
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS)
+    parser.add_argument('--stocks', nargs='+', default=stocks)
+    parser.add_argument('--data-root', default=data_root,
+                        help="Folder holding post_data/ and price_data/")
+    parser.add_argument('--store', default=store_dir, help="Feature store folder")
+    parser.add_argument('--cache', default=cache_path,
+                        help="SQLite file for cached sentiment scores")
+    parser.add_argument('--no-cache', action='store_true', help="Score every post from scratch")
+    parser.add_argument('--cache-max-age-days', type=int, default=30,
+                        help="Evict cached scores no run has used for this many days")
+    parser.add_argument('--ingest-cache', default=ingest_cache_dir,
+                        help="Folder for the Parquet copies of the input CSVs")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument('--chunksize', type=int, default=256, help="Posts sent to a worker per batch")
+    dedup.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrumentation.configure_from_args(args)
+    build_features(args.stocks, args.variants, args.data_root, args.store,
+                   None if args.no_cache else args.cache, args.cache_max_age_days,
+                   args.workers, args.chunksize, args.ingest_cache, args.dedup, args.duplicates,
+                   args.dedup_threshold)
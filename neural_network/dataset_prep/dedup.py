@@ -0,0 +1,218 @@
+import re
+import time
+import zlib
+import hashlib
+import argparse
+import numpy as np
+from multiprocessing import Pool, cpu_count
+
+# Cross-posts, reposts and bot templates are clustered before scoring, so
+# each cluster is scored once. 'exact' puts posts with the same normalized
+# text in one cluster; 'near' also joins clusters whose word-shingle
+# Jaccard similarity, estimated from MinHash signatures, is at least the
+# threshold. Candidate pairs come from LSH banding: two signatures that
+# agree on all rows of any band are compared.
+
+MODES = ['off', 'exact', 'near']
+# What the daily aggregates do with the posts of one cluster on one (stock, day)
+POLICIES = ['count', 'collapse']
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE = 3
+THRESHOLD = 0.8
+
+_URL = re.compile(r'https?://\S+|www\.\S+')
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+# Mixes the token hashes of one shingle into a single 64-bit value
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+# Permutations x shingles hashed at once; bounds a batch's uint64 temporaries to a few times 32 MB
+HASH_BLOCK = 2 ** 22
+
+
+def normalize(text):
+    """Lower-cased words of text without URLs and punctuation, single-spaced."""
+    text = _URL.sub(' ', str(text).lower())
+    return ' '.join(_PUNCTUATION.sub(' ', text).split())
+
+
+def _permutations(num_perm, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True)
+    return a, b
+
+
+def _normalize_batch(texts):
+    normalized = [normalize(text) for text in texts]
+    return normalized, [hashlib.sha1(text.encode()).digest() for text in normalized]
+
+
+def _signature_batch(args):
+    texts, shingle, a, b = args
+    # Token hashes of every text, each text padded to at least one whole shingle
+    tokens = [[zlib.crc32(word.encode()) for word in text.split()] for text in texts]
+    lengths = np.array([max(len(words), shingle) for words in tokens])
+    flat = np.zeros(lengths.sum() + shingle, dtype=np.uint64)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    for start, words in zip(starts, tokens):
+        flat[start:start + len(words)] = words
+
+    # Shingle j of a text mixes its tokens j..j+shingle-1; positions past a text's last shingle are dropped
+    with np.errstate(over='ignore'):
+        mixed = sum(flat[i:len(flat) - shingle + i] * _MIX[i] for i in range(shingle))
+    counts = lengths - shingle + 1
+    text_of = np.repeat(np.arange(len(texts)), lengths)
+    keep = np.arange(len(text_of)) - starts[text_of] < counts[text_of]
+    hashes = mixed[:len(text_of)][keep]
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+
+    # Multiply-shift hash per permutation (uint64 arithmetic wraps), minimum over each text's shingles.
+    # A block of permutations at a time, so memory follows HASH_BLOCK rather than num_perm x shingles
+    signatures = np.empty((len(texts), len(a)), dtype=np.uint32)
+    block = max(1, HASH_BLOCK // len(hashes))
+    for first in range(0, len(a), block):
+        with np.errstate(over='ignore'):
+            permuted = (a[first:first + block, None] * hashes + b[first:first + block, None]) >> np.uint64(32)
+        signatures[:, first:first + block] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+def _map(fn, batches, workers):
+    if workers <= 1:
+        return [fn(batch) for batch in batches]
+    with Pool(workers) as pool:
+        return pool.map(fn, batches)
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle=SHINGLE, workers=1, chunksize=2048, seed=0):
+    """(n, num_perm) uint32 MinHash signatures of the word shingles of normalized texts."""
+    a, b = _permutations(num_perm, seed)
+    batches = [(texts[start:start + chunksize], shingle, a, b) for start in range(0, len(texts), chunksize)]
+    if not batches:
+        return np.empty((0, num_perm), dtype=np.uint32)
+    return np.concatenate(_map(_signature_batch, batches, workers))
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def lsh_clusters(signatures, bands=BANDS, threshold=THRESHOLD):
+    """Cluster root of every signature; rows sharing a band bucket and threshold agreement are joined."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    parent = list(range(n))
+    for band in range(bands):
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * rows))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        heads = first[inverse.ravel()]
+        candidates = np.flatnonzero(heads != np.arange(n))
+        # Each bucket member is compared with the bucket's first row, not with every other member
+        agreement = (signatures[candidates] == signatures[heads[candidates]]).mean(axis=1)
+        for i, head in zip(candidates[agreement >= threshold], heads[candidates[agreement >= threshold]]):
+            root_i, root_head = _find(parent, i), _find(parent, head)
+            if root_i != root_head:
+                parent[max(root_i, root_head)] = min(root_i, root_head)
+    return np.array([_find(parent, i) for i in range(n)], dtype=np.int64)
+
+
+def duplicate_clusters(texts, mode='near', threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, shingle=SHINGLE,
+                       workers=None, chunksize=2048, seed=0):
+    """(rep, stats): rep[i] is the index of the first text of text i's cluster.
+
+    Texts are normalized and hashed in parallel chunks of chunksize; only
+    one text per exact cluster gets a MinHash signature. stats counts the
+    texts, the clusters after each stage and the scoring work removed.
+    """
+    if mode not in MODES[1:]:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+    texts = list(texts)
+    n = len(texts)
+    workers = min(workers or cpu_count(), max(1, -(-n // chunksize)))
+    start = time.perf_counter()
+
+    normalized, digests = [], []
+    for batch_normalized, batch_digests in _map(_normalize_batch, [texts[i:i + chunksize]
+                                                                   for i in range(0, n, chunksize)], workers):
+        normalized.extend(batch_normalized)
+        digests.extend(batch_digests)
+    _, first, inverse = np.unique(np.array(digests, dtype='S20'), return_index=True, return_inverse=True)
+    rep = first[inverse.ravel()] if n else np.empty(0, dtype=np.int64)
+    exact_clusters = len(first)
+
+    if mode == 'near' and exact_clusters > 1:
+        uniques = np.sort(first)
+        signatures = minhash_signatures([normalized[i] for i in uniques], num_perm, shingle, workers, chunksize, seed)
+        roots = uniques[lsh_clusters(signatures, bands, threshold)]
+        # Roots are the smallest member of each near cluster, so they stay the first text of it
+        rep = roots[np.searchsorted(uniques, rep)]
+
+    clusters = len(np.unique(rep))
+    stats = {
+        'posts': n,
+        'exact_clusters': int(exact_clusters),
+        'clusters': int(clusters),
+        'removed': int(n - clusters),
+        'removed_frac': round((n - clusters) / n, 4) if n else 0.0,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    return rep.astype(np.int64), stats
+
+
+def report(stats):
+    print(f"Dedup: {stats['posts']} posts, {stats['exact_clusters']} after exact matching, "
+          f"{stats['clusters']} clusters; scoring {stats['removed']} fewer posts "
+          f"({stats['removed_frac']:.1%}) after {stats['seconds']:.2f}s")
+
+
+def collapse_duplicates(posts_df):
+    """One post per (stock_symbol, Date, cluster), for the 'collapse' policy of the daily aggregates."""
+    return posts_df.drop_duplicates(['stock_symbol', 'Date', 'cluster']).reset_index(drop=True)
+
+
+def add_arguments(parser):
+    parser.add_argument('--dedup', choices=MODES, default='off',
+                        help="Cluster exact (normalized text) or near duplicates and score one post per cluster")
+    parser.add_argument('--dedup-threshold', type=float, default=THRESHOLD,
+                        help="Estimated Jaccard similarity of word shingles that makes posts near duplicates")
+    parser.add_argument('--duplicates', choices=POLICIES, default='count',
+                        help="Count every post of a cluster in the daily features, or each cluster once per day")
+
+
+def benchmark_corpus(n, duplicate_frac=0.4, seed=0):
+    """Texts where duplicate_frac of them are cross-posts, case/punctuation variants or one-word edits of others."""
+    from sentiment_scoring import benchmark_texts
+
+    rng = np.random.default_rng(seed)
+    texts = benchmark_texts(n, seed)
+    for i in np.flatnonzero(rng.random(n) < duplicate_frac)[1:]:
+        source = texts[rng.integers(0, i)]
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            texts[i] = source
+        elif kind == 1:
+            texts[i] = source.upper() + '!!'
+        else:
+            words = source.split()
+            words[rng.integers(0, len(words))] = 'edited'
+            texts[i] = ' '.join(words)
+    return texts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time duplicate clustering on a synthetic corpus with known duplicates.")
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--duplicate-frac', type=float, default=0.4)
+    parser.add_argument('--mode', choices=MODES[1:], default='near')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = benchmark_corpus(args.posts, args.duplicate_frac)
+    _, stats = duplicate_clusters(corpus, args.mode, args.threshold, workers=args.workers)
+    report(stats)
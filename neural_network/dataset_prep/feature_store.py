@@ -0,0 +1,278 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import schema
+from timeseries import FEATURE_COLS
+
+dataset_prep_dir = os.path.dirname(os.path.abspath(__file__))
+store_dir = os.path.join(dataset_prep_dir, 'feature_store')
+
+# Rows per Parquet row group; a range read decodes the row groups it overlaps
+ROW_GROUP_SIZE = 128
+# An append that would leave more part files than this rewrites the ticker as one
+MAX_PARTS = 16
+
+
+def _date(value):
+    return None if value is None else pd.Timestamp(value).date()
+
+
+class FeatureStore:
+    """The per-day prep output of every (variant, ticker), indexed by (ticker, Date).
+
+    root/{variant}/{ticker}/part-NNNNN.parquet hold a ticker's rows sorted
+    by Date in row groups of ROW_GROUP_SIZE, so a date range decodes only
+    the row groups around it. root/{variant}/metadata.json keeps, next to
+    the data:
+
+    - columns: the column -> dtype schema every write must match; its
+      dtypes are the compact ones of schema.COLUMNS
+    - feature_cols: the variant's model inputs (timeseries.FEATURE_COLS)
+    - scaler: the StandardScaler fitted on those inputs
+    - index: per ticker, each part file with its first/last Date and rows
+
+    Reads consult the index first and open only the parts overlapping the
+    requested range. Files and metadata are replaced atomically.
+    """
+
+    def __init__(self, root=store_dir):
+        self.root = root
+        self._metadata = {}
+
+    def variants(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, 'metadata.json')))
+
+    def _metadata_path(self, variant):
+        return os.path.join(self.root, variant, 'metadata.json')
+
+    def metadata(self, variant):
+        if variant not in self._metadata:
+            path = self._metadata_path(variant)
+            if os.path.exists(path):
+                with open(path) as f:
+                    self._metadata[variant] = json.load(f)
+            else:
+                self._metadata[variant] = {'columns': None, 'feature_cols': FEATURE_COLS.get(variant),
+                                           'scaler': None, 'index': {}}
+        return self._metadata[variant]
+
+    def _save_metadata(self, variant):
+        path = self._metadata_path(variant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._metadata[variant], f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def tickers(self, variant):
+        return list(self.metadata(variant)['index'])
+
+    def feature_cols(self, variant):
+        return self.metadata(variant)['feature_cols']
+
+    def columns(self, variant):
+        return self.metadata(variant)['columns']
+
+    def last_date(self, variant, ticker):
+        """Latest stored Date of the ticker, read from the index alone; None if it has no rows."""
+        parts = self.metadata(variant)['index'].get(ticker)
+        return _date(parts[-1]['last_date']) if parts else None
+
+    def rows(self, variant, ticker):
+        return sum(part['rows'] for part in self.metadata(variant)['index'].get(ticker, []))
+
+    def _check_schema(self, variant, df):
+        schema.check(df, f"{variant} rows")
+        columns = {column: str(dtype) for column, dtype in df.dtypes.items()}
+        meta = self.metadata(variant)
+        if meta['columns'] is None:
+            meta['columns'] = columns
+        elif columns != meta['columns']:
+            raise ValueError(f"{variant} rows do not match the store's schema: "
+                             f"expected {meta['columns']}, got {columns}")
+
+    def _write_part(self, variant, ticker, df, number):
+        folder = os.path.join(self.root, variant, ticker)
+        os.makedirs(folder, exist_ok=True)
+        name = f'part-{number:05d}.parquet'
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Dates are whole days, so they are stored as date32
+        table = table.set_column(table.schema.get_field_index('Date'), 'Date', table['Date'].cast(pa.date32()))
+        pq.write_table(table, os.path.join(folder, name + '.tmp'), row_group_size=ROW_GROUP_SIZE)
+        os.replace(os.path.join(folder, name + '.tmp'), os.path.join(folder, name))
+        return {'file': name, 'first_date': str(_date(df['Date'].iloc[0])),
+                'last_date': str(_date(df['Date'].iloc[-1])), 'rows': len(df)}
+
+    def write(self, variant, ticker, df):
+        """Replace all rows of (variant, ticker) with df."""
+        df = df.sort_values('Date', kind='stable').reset_index(drop=True)
+        self._check_schema(variant, df)
+        index = self.metadata(variant)['index']
+        old = index.get(ticker, [])
+        number = max((int(part['file'][5:10]) for part in old), default=-1) + 1
+        index[ticker] = [self._write_part(variant, ticker, df, number)] if len(df) else []
+        self._save_metadata(variant)
+        for part in old:
+            os.remove(os.path.join(self.root, variant, ticker, part['file']))
+
+    def append(self, variant, ticker, df):
+        """Add rows dated after the ticker's last stored Date as a new part file."""
+        if df.empty:
+            return
+        df = df.sort_values('Date', kind='stable').reset_index(drop=True)
+        last = self.last_date(variant, ticker)
+        if last is not None and _date(df['Date'].iloc[0]) <= last:
+            raise ValueError(f"{variant}/{ticker}: appended rows start at {df['Date'].iloc[0]}, "
+                             f"not after the stored {last}")
+        parts = self.metadata(variant)['index'].get(ticker, [])
+        if len(parts) >= MAX_PARTS:
+            self.write(variant, ticker, pd.concat([self.read(variant, ticker), df], ignore_index=True))
+            return
+        self._check_schema(variant, df)
+        number = max((int(part['file'][5:10]) for part in parts), default=-1) + 1
+        self.metadata(variant)['index'][ticker] = parts + [self._write_part(variant, ticker, df, number)]
+        self._save_metadata(variant)
+
+    def read(self, variant, ticker, start=None, end=None, columns=None):
+        """Rows of (variant, ticker) with start <= Date <= end (both inclusive), optionally only some columns.
+
+        Date comes back as schema.FRAME_DATE, like the prep frames.
+        """
+        start, end = _date(start), _date(end)
+        parts = [part for part in self.metadata(variant)['index'].get(ticker, [])
+                 if (start is None or _date(part['last_date']) >= start)
+                 and (end is None or _date(part['first_date']) <= end)]
+        read_columns = None if columns is None else ['Date'] + [column for column in columns if column != 'Date']
+
+        tables = [self._read_part(os.path.join(self.root, variant, ticker, part['file']), start, end, read_columns)
+                  for part in parts]
+        if not tables:
+            return self._empty(variant, columns)
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        df = table.to_pandas(date_as_object=False)
+        df['Date'] = df['Date'].astype(schema.FRAME_DATE)
+        return df[list(columns)] if columns is not None else df
+
+    @staticmethod
+    def _read_part(path, start, end, columns):
+        # Decode only the row groups whose Date statistics overlap [start, end], then trim their rows
+        parquet = pq.ParquetFile(path)
+        date_column = parquet.schema_arrow.get_field_index('Date')
+        groups = []
+        for i in range(parquet.num_row_groups):
+            stats = parquet.metadata.row_group(i).column(date_column).statistics
+            if (start is None or stats.max >= start) and (end is None or stats.min <= end):
+                groups.append(i)
+        table = parquet.read_row_groups(groups, columns=columns)
+        if start is not None or end is not None:
+            dates = np.asarray(table.column('Date').to_numpy(zero_copy_only=False), dtype='datetime64[D]')
+            keep = np.ones(len(dates), dtype=bool)
+            if start is not None:
+                keep &= dates >= np.datetime64(start)
+            if end is not None:
+                keep &= dates <= np.datetime64(end)
+            table = table.filter(pa.array(keep))
+        return table
+
+    def _empty(self, variant, columns=None):
+        columns_dtypes = self.columns(variant) or {'Date': schema.FRAME_DATE}
+        df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in columns_dtypes.items()})
+        return df[list(columns)] if columns is not None else df
+
+    def read_many(self, variant, tickers=None, start=None, end=None, columns=None):
+        """{ticker: rows} for several tickers (all of the variant's by default) over the same range."""
+        return {ticker: self.read(variant, ticker, start, end, columns)
+                for ticker in (tickers if tickers is not None else self.tickers(variant))}
+
+    def save_scaler(self, variant, scaler):
+        """Keep a fitted StandardScaler's parameters in the variant's metadata."""
+        self.metadata(variant)['scaler'] = {
+            'type': type(scaler).__name__,
+            'feature_names': [str(name) for name in getattr(scaler, 'feature_names_in_', self.feature_cols(variant))],
+            'mean': scaler.mean_.tolist(),
+            'scale': scaler.scale_.tolist(),
+            'var': scaler.var_.tolist(),
+            'n_samples_seen': int(scaler.n_samples_seen_),
+        }
+        self._save_metadata(variant)
+
+    def load_scaler(self, variant):
+        """The variant's StandardScaler, rebuilt from its metadata; None if none was saved."""
+        from sklearn.preprocessing import StandardScaler
+
+        params = self.metadata(variant)['scaler']
+        if params is None:
+            return None
+        scaler = StandardScaler()
+        scaler.mean_ = np.array(params['mean'])
+        scaler.scale_ = np.array(params['scale'])
+        scaler.var_ = np.array(params['var'])
+        scaler.n_samples_seen_ = np.int64(params['n_samples_seen'])
+        scaler.n_features_in_ = len(params['mean'])
+        scaler.feature_names_in_ = np.array(params['feature_names'], dtype=object)
+        return scaler
+
+
+def conform_store(store, variants=None):
+    """Rewrite every ticker of the store in the dtypes of schema.COLUMNS."""
+    for variant in variants or store.variants():
+        frames = {ticker: store.read(variant, ticker) for ticker in store.tickers(variant)}
+        store.metadata(variant)['columns'] = None
+        for ticker, df in frames.items():
+            store.write(variant, ticker, schema.conform(df))
+        print(f"{variant}: {len(frames)} tickers as {store.columns(variant)}")
+    return store
+
+
+def import_pickles(folder=dataset_prep_dir, store=None, variants=tuple(FEATURE_COLS)):
+    """Load the all_{variant}/{stock}_{variant}.pkl frames and {variant}_scaler.joblib files into the store."""
+    import joblib
+
+    store = store or FeatureStore()
+    for variant in variants:
+        variant_dir = os.path.join(folder, f'all_{variant}')
+        suffix = f'_{variant}.pkl'
+        for name in sorted(os.listdir(variant_dir)):
+            if name.endswith(suffix):
+                df = pd.read_pickle(os.path.join(variant_dir, name))
+                store.write(variant, name[:-len(suffix)], schema.conform(df))
+                print(f"{variant}/{name[:-len(suffix)]}: {len(df)} rows")
+        scaler_path = os.path.join(variant_dir, f'{variant}_scaler.joblib')
+        if os.path.exists(scaler_path):
+            store.save_scaler(variant, joblib.load(scaler_path))
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect the feature store or import the old per-ticker pickles into it.")
+    parser.add_argument('--store', default=store_dir)
+    parser.add_argument('--import-pickles', metavar='FOLDER', nargs='?', const=dataset_prep_dir,
+                        help="Import FOLDER/all_{variant}/*.pkl and the joblib scalers")
+    parser.add_argument('--conform', action='store_true', help="Rewrite the store in the compact schema's dtypes")
+    parser.add_argument('--read', nargs=2, metavar=('VARIANT', 'TICKER'), help="Print a range of one ticker's rows")
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--columns', nargs='+')
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store)
+    if args.import_pickles:
+        import_pickles(args.import_pickles, store)
+    if args.conform:
+        conform_store(store)
+    if args.read:
+        print(store.read(*args.read, start=args.start, end=args.end, columns=args.columns))
+    elif not (args.import_pickles or args.conform):
+        for variant in store.variants():
+            print(f"{variant}: features {store.feature_cols(variant)}")
+            for ticker in store.tickers(variant):
+                parts = store.metadata(variant)['index'][ticker]
+                print(f"  {ticker}: {store.rows(variant, ticker)} rows in {len(parts)} parts, "
+                      f"{parts[0]['first_date'] if parts else '-'}..{store.last_date(variant, ticker) or '-'}")
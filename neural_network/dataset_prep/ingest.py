@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+# Typed Parquet copies of post_data/*.csv and price_data/{stock}.csv.
+# Each cached file is rebuilt only when its source CSV changed: mtime and
+# size are checked first and the content hash settles it when they differ.
+
+POSTS_ROW_GROUP_SIZE = 100_000
+
+
+def _file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class IngestCache:
+    """Columnar cache of the prep inputs under cache_dir.
+
+    posts.parquet and stock_index.parquet mirror post_data/, with
+    created_utc as datetime64; posts are stored in created_utc order so date
+    filters skip whole row groups. price_data/{stock}.parquet holds one
+    file per symbol with Date as a UTC datetime64.
+    """
+
+    def __init__(self, data_root, cache_dir):
+        self.data_root = data_root
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        os.makedirs(os.path.join(cache_dir, 'price_data'), exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+
+    def _save_manifest(self):
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+
+    def _fresh(self, name, source, target):
+        """True if target was built from the current contents of source."""
+        entry = self.manifest.get(name)
+        if entry is None or not os.path.exists(target):
+            return False
+        stat = os.stat(source)
+        if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return True
+        if entry['sha1'] != _file_hash(source):
+            return False
+        # Touched but unchanged: remember the new mtime and keep the cache
+        entry['mtime'], entry['size'] = stat.st_mtime, stat.st_size
+        self._save_manifest()
+        return True
+
+    def _record(self, name, source):
+        stat = os.stat(source)
+        self.manifest[name] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha1': _file_hash(source)}
+        self._save_manifest()
+
+    def _build(self, name, source, target, convert, **parquet_kwargs):
+        if self._fresh(name, source, target):
+            return
+        print(f"Converting {source} to {target}")
+        df = convert(pd.read_csv(source))
+        df.to_parquet(target + '.tmp', index=False, **parquet_kwargs)
+        os.replace(target + '.tmp', target)
+        self._record(name, source)
+
+    def _posts_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}.parquet')
+
+    def _prices_path(self, stock):
+        return os.path.join(self.cache_dir, 'price_data', f'{stock}.parquet')
+
+    def read_posts(self, columns=None, start=None, end=None):
+        """posts.csv rows with start <= created_utc < end."""
+        source = os.path.join(self.data_root, 'post_data', 'posts.csv')
+        target = self._posts_path('posts')
+
+        def convert(df):
+            df['created_utc'] = pd.to_datetime(df['created_utc'], unit='s')
+            return df.sort_values('created_utc', kind='stable')
+
+        self._build('posts', source, target, convert, row_group_size=POSTS_ROW_GROUP_SIZE)
+        return pd.read_parquet(target, columns=columns, filters=_range_filter('created_utc', start, end))
+
+    def read_stock_index(self, columns=None):
+        source = os.path.join(self.data_root, 'post_data', 'stock_index.csv')
+        target = self._posts_path('stock_index')
+
+        def convert(df):
+            df['created_utc'] = pd.to_datetime(df['created_utc'], unit='s')
+            return df
+
+        self._build('stock_index', source, target, convert)
+        return pd.read_parquet(target, columns=columns)
+
+    def read_prices(self, stock, columns=None, start=None, end=None):
+        """price_data/{stock}.csv rows with start <= Date < end, Date in UTC."""
+        source = os.path.join(self.data_root, 'price_data', f'{stock}.csv')
+        target = self._prices_path(stock)
+
+        def convert(df):
+            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', utc=True).dt.tz_convert(None)
+            return df
+
+        self._build(f'price_data/{stock}', source, target, convert)
+        return pd.read_parquet(target, columns=columns, filters=_range_filter('Date', start, end))
+
+
+def _range_filter(column, start, end):
+    filters = []
+    if start is not None:
+        filters.append((column, '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append((column, '<', pd.Timestamp(end)))
+    return filters or None
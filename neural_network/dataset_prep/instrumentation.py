@@ -0,0 +1,235 @@
+import os
+import csv
+import sys
+import json
+import time
+import atexit
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+
+# Per-stage timing and memory of the prep scripts. Off unless
+# PREP_INSTRUMENT names a report file (.json or .csv) or a script is run
+# with --instrument; while off, stage() hands back one shared no-op object.
+#
+#   PREP_INSTRUMENT=prep_report.json PREP_PROFILE_STAGE=sentiment_scoring python dataset_all.py
+#
+# PREP_PROFILE_STAGE / --profile-stage profile every run of that stage with
+# cProfile (default) or tracemalloc, chosen by PREP_PROFILE / --profile.
+
+PROFILERS = ['cprofile', 'tracemalloc']
+
+_MB = 1024 * 1024
+
+
+class _NullStage:
+    """What stage() returns while instrumentation is off; setting rows on it does nothing."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_stage = _NullStage()
+
+
+class _Stage:
+    def __init__(self, recorder, name, ticker, variant, rows):
+        self.recorder = recorder
+        self.name = name
+        self.ticker = ticker
+        self.variant = variant
+        self.rows = rows
+
+    def __enter__(self):
+        self.peak_rss = self.start_rss = self.recorder.rss()
+        self.recorder.open(self)
+        self.cpu = _cpu_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        cpu = _cpu_time() - self.cpu
+        self.recorder.close(self)
+        self.peak_rss = max(self.peak_rss, self.recorder.rss())
+        self.recorder.records.append({
+            'stage': self.name,
+            'ticker': self.ticker,
+            'variant': self.variant,
+            'rows': None if self.rows is None else int(self.rows),
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'start_rss_mb': round(self.start_rss / _MB, 1),
+            'peak_rss_mb': round(self.peak_rss / _MB, 1),
+            'failed': exc[0] is not None,
+        })
+        return False
+
+
+def _cpu_time():
+    # This process plus its finished children, so scoring pools count once they are joined
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class StageRecorder:
+    """Collects one record per stage run and writes them as a JSON or CSV report.
+
+    Peak RSS is sampled every sample_interval seconds while a stage is open,
+    over this process and its children (the scoring pool's workers).
+    """
+
+    def __init__(self, report_path, profile_stage=None, profiler='cprofile', sample_interval=0.01):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}")
+        import psutil
+
+        self.report_path = report_path
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.sample_interval = sample_interval
+        self.records = []
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.process = psutil.Process()
+        self.profile = None
+        self.open_stages = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        threading.Thread(target=self._sample, daemon=True).start()
+
+    def rss(self):
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except Exception:
+                # Workers can exit between listing and reading them
+                pass
+        return total
+
+    def _sample(self):
+        while True:
+            self.wake.wait()
+            rss = self.rss()
+            with self.lock:
+                for stage in self.open_stages:
+                    stage.peak_rss = max(stage.peak_rss, rss)
+                if not self.open_stages:
+                    self.wake.clear()
+            time.sleep(self.sample_interval)
+
+    def open(self, stage):
+        with self.lock:
+            self.open_stages.append(stage)
+            self.wake.set()
+        if stage.name == self.profile_stage:
+            self._start_profile()
+
+    def close(self, stage):
+        if stage.name == self.profile_stage:
+            self._stop_profile()
+        with self.lock:
+            self.open_stages.remove(stage)
+
+    def _start_profile(self):
+        if self.profiler == 'cprofile':
+            self.profile = self.profile or cProfile.Profile()
+            self.profile.enable()
+        elif not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+
+    def _stop_profile(self):
+        if self.profiler == 'cprofile':
+            self.profile.disable()
+        else:
+            # Keep the snapshot of the latest run; tracing restarts with the next one
+            self.profile = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+    def profile_path(self):
+        suffix = 'prof' if self.profiler == 'cprofile' else 'tracemalloc'
+        return f"{os.path.splitext(self.report_path)[0]}.{self.profile_stage}.{suffix}"
+
+    def summary(self):
+        """Wall/CPU seconds, rows and the highest peak RSS per stage name, summed over tickers."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'runs': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0,
+                                                        'peak_rss_mb': 0.0})
+            total['runs'] += 1
+            total['wall_s'] = round(total['wall_s'] + record['wall_s'], 4)
+            total['cpu_s'] = round(total['cpu_s'] + record['cpu_s'], 4)
+            total['rows'] += record['rows'] or 0
+            total['peak_rss_mb'] = max(total['peak_rss_mb'], record['peak_rss_mb'])
+        return totals
+
+    def write(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        if self.report_path.endswith('.csv'):
+            with open(self.report_path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.records[0]) if self.records else ['stage'])
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(self.report_path, 'w') as f:
+                json.dump({'started_at': self.started_at, 'argv': sys.argv, 'pid': os.getpid(),
+                           'summary': self.summary(), 'stages': self.records}, f, indent=1)
+
+        if self.profile is not None:
+            path = self.profile_path()
+            if self.profiler == 'cprofile':
+                self.profile.dump_stats(path)
+            else:
+                self.profile.dump(path)
+            print(f"{self.profiler} dump of stage {self.profile_stage}: {path}")
+        print(f"Stage report: {self.report_path}")
+
+
+_recorder = None
+
+
+def stage(name, ticker=None, variant=None, rows=None):
+    """Context manager timing one stage run; set .rows on it to record how many rows it handled."""
+    if _recorder is None:
+        return _null_stage
+    return _Stage(_recorder, name, ticker, variant, rows)
+
+
+def enabled():
+    return _recorder is not None
+
+
+def configure(report_path, profile_stage=None, profiler='cprofile'):
+    """Switch instrumentation on for this process; the report is written at exit."""
+    global _recorder
+    if _recorder is not None:
+        return _recorder
+    _recorder = StageRecorder(report_path, profile_stage, profiler)
+    atexit.register(_recorder.write)
+    return _recorder
+
+
+def add_arguments(parser):
+    parser.add_argument('--instrument', metavar='REPORT', default=os.environ.get('PREP_INSTRUMENT'),
+                        help="Write per-stage wall/CPU time, peak RSS and rows to REPORT (.json or .csv)")
+    parser.add_argument('--profile-stage', default=os.environ.get('PREP_PROFILE_STAGE'),
+                        help="Also profile every run of this stage (needs --instrument)")
+    parser.add_argument('--profile', choices=PROFILERS, default=os.environ.get('PREP_PROFILE', 'cprofile'),
+                        help="Profiler for --profile-stage")
+
+
+def configure_from_args(args):
+    if args.instrument:
+        configure(args.instrument, args.profile_stage, args.profile)
+
+
+# Scripts run without the flags still honour the environment
+if os.environ.get('PREP_INSTRUMENT'):
+    configure(os.environ['PREP_INSTRUMENT'], os.environ.get('PREP_PROFILE_STAGE'),
+              os.environ.get('PREP_PROFILE', 'cprofile'))
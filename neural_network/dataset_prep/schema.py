@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Compact dtypes kept from ingest through the window stores: dates at day
+# resolution, tickers as categories or int16 codes, and float32 prices,
+# sentiment, features, targets and windows. conform() narrows a frame to
+# them where it enters the prep; check() and check_array() reject wider
+# dtypes at the store and window-store writes, so an accidental upcast
+# fails there instead of doubling memory and disk downstream.
+
+# pandas has no day unit, so frame dates are datetime64[s] at midnight; NumPy arrays use datetime64[D]
+FRAME_DATE = 'datetime64[s]'
+DATE = 'datetime64[D]'
+FLOAT = 'float32'
+LABEL = 'int16'
+
+# Headers of the post_data/ CSVs: posts.csv, and stock_index.csv with one row per (post, ticker)
+POST_COLUMNS = ['id', 'created_utc', 'subreddit', 'author', 'title', 'selftext', 'permalink', 'url']
+STOCK_INDEX_COLUMNS = ['id', 'stock_symbol', 'created_utc']
+
+# Volume stays int64 so share counts stay exact
+COLUMNS = {
+    'Date': FRAME_DATE,
+    'Open': FLOAT, 'High': FLOAT, 'Low': FLOAT, 'Close': FLOAT,
+    'Volume': 'int64',
+    'pos': FLOAT, 'neg': FLOAT, 'neu': FLOAT,
+    'average_pos': FLOAT, 'average_neg': FLOAT, 'average_neu': FLOAT,
+    'positive_ratio': FLOAT, 'negative_ratio': FLOAT, 'neutral_ratio': FLOAT,
+    'LogReturn_Close': FLOAT, 'LogReturn_Volume': FLOAT,
+    'stock_symbol': 'category',
+    'Stock': LABEL,
+}
+
+
+def frame_dates(values):
+    """Calendar days of datetime-like values (tz-aware ones in their own zone) as FRAME_DATE."""
+    dates = pd.to_datetime(pd.Series(values))
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return dates.dt.floor('D').astype(FRAME_DATE)
+
+
+def conform(df):
+    """df with every COLUMNS column it has cast to the schema dtype."""
+    casts = {}
+    for column, dtype in COLUMNS.items():
+        if column in df and str(df[column].dtype) != dtype:
+            casts[column] = frame_dates(df[column]).to_numpy() if column == 'Date' else df[column].astype(dtype)
+    return df.assign(**casts) if casts else df
+
+
+def check(df, where):
+    """Raise ValueError if any COLUMNS column of df has another dtype than the schema's."""
+    wrong = [f"{column} is {df[column].dtype}, not {COLUMNS[column]}"
+             for column in df.columns if column in COLUMNS and str(df[column].dtype) != COLUMNS[column]]
+    if wrong:
+        raise ValueError(f"{where} does not match the compact schema: {'; '.join(wrong)}")
+
+
+def check_array(array, dtype, where):
+    if np.asarray(array).dtype != np.dtype(dtype):
+        raise ValueError(f"{where} is {np.asarray(array).dtype}, not {dtype}")
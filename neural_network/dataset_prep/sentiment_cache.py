@@ -0,0 +1,89 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+
+def text_hash(text):
+    """Stable hash of the merged 'title. selftext' string that gets scored."""
+    return hashlib.blake2b(str(text).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SentimentCache:
+    """On-disk VADER score store keyed by post id plus a hash of its text.
+
+    A post whose text changed (edited selftext, different merge) hashes
+    differently and counts as a miss; its old row is replaced on put().
+    Rows that no run has looked up for max_age_days are dropped by evict().
+    """
+
+    def __init__(self, path, max_age_days=30):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.now = int(time.time())
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " id TEXT PRIMARY KEY,"
+            " text_hash TEXT NOT NULL,"
+            " pos REAL NOT NULL,"
+            " neg REAL NOT NULL,"
+            " neu REAL NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, ids, hashes):
+        """Return {index: (pos, neg, neu)} for the positions that are cached."""
+        cur = self.conn.cursor()
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (idx INTEGER, id TEXT, text_hash TEXT)")
+        cur.execute("DELETE FROM lookup")
+        cur.executemany("INSERT INTO lookup VALUES (?, ?, ?)",
+                        ((i, str(post_id), h) for i, (post_id, h) in enumerate(zip(ids, hashes))))
+        rows = cur.execute(
+            "SELECT lookup.idx, scores.pos, scores.neg, scores.neu FROM lookup"
+            " JOIN scores ON scores.id = lookup.id AND scores.text_hash = lookup.text_hash"
+        ).fetchall()
+        cur.execute(
+            "UPDATE scores SET last_used = ? WHERE id IN"
+            " (SELECT lookup.id FROM lookup JOIN scores"
+            "  ON scores.id = lookup.id AND scores.text_hash = lookup.text_hash)",
+            (self.now,)
+        )
+        cur.execute("DELETE FROM lookup")
+        self.conn.commit()
+
+        found = {idx: (pos, neg, neu) for idx, pos, neg, neu in rows}
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    def put_many(self, ids, hashes, scores):
+        """Store (pos, neg, neu) tuples, replacing rows with a stale text hash."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)",
+            ((str(post_id), h, pos, neg, neu, self.now)
+             for post_id, h, (pos, neg, neu) in zip(ids, hashes, scores))
+        )
+        self.conn.commit()
+
+    def evict(self):
+        """Drop rows unused for max_age_days and compact the file. Returns rows removed."""
+        cutoff = self.now - self.max_age_days * 24 * 3600
+        removed = self.conn.execute("DELETE FROM scores WHERE last_used < ?", (cutoff,)).rowcount
+        self.conn.commit()
+        if removed:
+            self.conn.execute("VACUUM")
+        return removed
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        print(f"Sentiment cache: {self.hits} hits, {self.misses} misses "
+              f"({hit_rate:.1%} hit rate), {size / 1e6:.1f} MB at {self.path}")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,117 @@
+import time
+import argparse
+import numpy as np
+from tqdm import tqdm
+from multiprocessing import Pool, cpu_count
+
+FIELDS = ('pos', 'neg', 'neu')
+LEXICON = 'sentiment/vader_lexicon.zip'
+
+# One analyzer per process, built on first use (importing nltk and loading the lexicon are the slow parts)
+_analyzer = None
+
+
+def ensure_lexicon(download=True):
+    """Path of the local VADER lexicon; downloads it only when no nltk.data.path folder has it.
+
+    On hosts without network access, copy vader_lexicon.zip into
+    sentiment/ under one of nltk.data.path (or $NLTK_DATA) beforehand.
+    """
+    import nltk
+
+    try:
+        return nltk.data.find(LEXICON)
+    except LookupError:
+        if not download or not nltk.download('vader_lexicon', quiet=True):
+            raise LookupError(f"No {LEXICON} under any of {nltk.data.path} and it was not downloaded; "
+                              f"install it with nltk.download('vader_lexicon') on a connected host") from None
+    return nltk.data.find(LEXICON)
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        ensure_lexicon()
+        from nltk.sentiment import SentimentIntensityAnalyzer
+
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def _init_worker():
+    _get_analyzer()
+
+
+def _score_batch(args):
+    texts, fields = args
+    analyzer = _get_analyzer()
+    out = np.empty((len(texts), len(fields)), dtype=np.float64)
+    for i, text in enumerate(texts):
+        scores = analyzer.polarity_scores(str(text))
+        out[i] = [scores[field] for field in fields]
+    return out
+
+
+def _batches(texts, chunksize, fields):
+    for start in range(0, len(texts), chunksize):
+        yield texts[start:start + chunksize], fields
+
+
+def score_texts(texts, workers=None, chunksize=256, fields=FIELDS, progress=False):
+    """Score texts with VADER and return an (n, len(fields)) float64 array.
+
+    Texts go to the workers in batches of chunksize and every worker loads
+    the analyzer once. workers=1 scores in this process, which is what the
+    Django command uses for small batches of titles.
+    """
+    texts = list(texts)
+    fields = tuple(fields)
+    if not texts:
+        return np.empty((0, len(fields)), dtype=np.float64)
+
+    workers = workers or cpu_count()
+    workers = min(workers, -(-len(texts) // chunksize))
+    batches = _batches(texts, chunksize, fields)
+    total = -(-len(texts) // chunksize)
+    # Built before the pool starts, so forked workers inherit it instead of importing nltk each
+    _get_analyzer()
+
+    if workers <= 1:
+        results = [_score_batch(batch) for batch in tqdm(batches, total=total, desc="Sentiment Analysis", disable=not progress)]
+    else:
+        with Pool(workers, initializer=_init_worker) as pool:
+            results = list(tqdm(pool.imap(_score_batch, batches), total=total, desc="Sentiment Analysis", disable=not progress))
+    return np.concatenate(results)
+
+
+def benchmark_texts(n, seed=0):
+    """Deterministic Reddit-like titles and bodies for the throughput benchmark."""
+    rng = np.random.default_rng(seed)
+    words = ['stock', 'calls', 'puts', 'moon', 'crash', 'great', 'terrible', 'earnings', 'beat',
+             'miss', 'buy', 'sell', 'hold', 'love', 'hate', 'bullish', 'bearish', 'loss', 'gain',
+             'the', 'is', 'going', 'to', 'not', 'very', 'really', 'yolo', 'dip', 'rally', 'good']
+    lengths = rng.integers(5, 80, size=n)
+    return [' '.join(rng.choice(words, size=length)) for length in lengths]
+
+
+def benchmark(n_posts=20000, worker_counts=(1, 2, 4, 8), chunksize=256):
+    """Print posts/sec of score_texts for each worker count."""
+    texts = benchmark_texts(n_posts)
+    results = {}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        score_texts(texts, workers=workers, chunksize=chunksize)
+        elapsed = time.perf_counter() - start
+        results[workers] = n_posts / elapsed
+        print(f"workers={workers:<3} chunksize={chunksize:<5} {results[workers]:>10.0f} posts/sec ({elapsed:.2f}s)")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sentiment scoring throughput benchmark.")
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, cpu_count()])
+    parser.add_argument('--chunksize', type=int, default=256)
+    args = parser.parse_args()
+
+    benchmark(args.posts, args.workers, args.chunksize)
@@ -0,0 +1,176 @@
+import re
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool, cpu_count
+
+# Symbol -> company names matched case-insensitively; the symbols of the
+# offline dataset and of the Reddit collection command
+COMPANIES = {
+    'AAPL': ['apple'],
+    'GME': ['gamestop'],
+    'MCD': ["mcdonalds", "mcdonald's"],
+    'MSFT': ['microsoft'],
+    'NFLX': ['netflix'],
+    'NVDA': ['nvidia'],
+    'TSLA': ['tesla'],
+    'META': ['facebook', 'meta platforms'],
+    'AMZN': ['amazon'],
+    'AMD': ['amd'],
+    'AVGO': ['broadcom'],
+    'PLTR': ['palantir'],
+    'MSTR': ['microstrategy'],
+    'XOM': ['exxon', 'exxonmobil'],
+    'MU': ['micron'],
+    'JPM': ['jpmorgan', 'jp morgan'],
+    'GOOG': ['google', 'alphabet'],
+    'CRM': ['salesforce'],
+    'LLY': ['eli lilly', 'lilly'],
+    'VST': ['vistra'],
+    'HD': ['home depot'],
+    'UNH': ['unitedhealth'],
+    'BAC': ['bank of america'],
+    'COST': ['costco'],
+    'SMCI': ['super micro', 'supermicro'],
+    'CVX': ['chevron'],
+    'V': ['visa'],
+    'COIN': ['coinbase'],
+}
+
+
+# Words, with the $ of a cashtag kept; company names are split the same way
+_TOKEN = re.compile(r"\$?\w+")
+
+
+class TickerMatcher:
+    """Tags texts with every symbol they mention in one scan over their words.
+
+    Each word is looked up in a table of the first words of all company
+    names, and only the names starting there are compared further, so the
+    cost per text does not grow with the number of symbols. Names match
+    case-insensitively and as whole words ('amd' inside 'amdocs' is no
+    hit). Symbols match as $sym in any case, or bare in upper case when at
+    least min_bare_ticker_len long, so 'V' or 'mu' in running text do not count.
+    """
+
+    def __init__(self, companies=COMPANIES, tickers=True, min_bare_ticker_len=2):
+        self.first_words = {}
+        for symbol, names in companies.items():
+            for name in names:
+                words = tuple(_TOKEN.findall(name.lower()))
+                self.first_words.setdefault(words[0], []).append((words, symbol))
+        self.cashtags = {f"${symbol.lower()}": symbol for symbol in companies} if tickers else {}
+        self.bare = {symbol.upper(): symbol for symbol in companies
+                     if tickers and len(symbol) >= min_bare_ticker_len}
+
+    def match(self, text):
+        """Sorted unique symbols mentioned in text."""
+        if not isinstance(text, str):
+            return []
+        tokens = _TOKEN.findall(text)
+        words = [token.lower() for token in tokens]
+        found = set()
+        for i, word in enumerate(words):
+            for name, symbol in self.first_words.get(word, ()):
+                if len(name) == 1 or tuple(words[i:i + len(name)]) == name:
+                    found.add(symbol)
+            if word in self.cashtags:
+                found.add(self.cashtags[word])
+            elif tokens[i] in self.bare:
+                found.add(self.bare[tokens[i]])
+        return sorted(found)
+
+    def match_many(self, texts):
+        return [self.match(text) for text in texts]
+
+
+# One matcher per process, built by the Pool initializer
+_matcher = None
+
+
+def _init_worker(companies, tickers, min_bare_ticker_len):
+    global _matcher
+    _matcher = TickerMatcher(companies, tickers, min_bare_ticker_len)
+
+
+def _index_chunk(chunk):
+    ids, texts, created_utc = chunk
+    rows = []
+    for post_id, text, created in zip(ids, texts, created_utc):
+        rows.extend((post_id, symbol, created) for symbol in _matcher.match(text))
+    return rows
+
+
+def _chunks(posts_path, text_columns, chunksize):
+    for df in pd.read_csv(posts_path, usecols=['id', 'created_utc', *text_columns], chunksize=chunksize,
+                          dtype={column: str for column in text_columns}):
+        texts = df[list(text_columns)].fillna('').agg(' '.join, axis=1)
+        yield df['id'].to_numpy(), texts.to_numpy(), df['created_utc'].to_numpy()
+
+
+def build_stock_index(posts_path, output_path=None, companies=COMPANIES, tickers=True, min_bare_ticker_len=2,
+                      text_columns=('title', 'selftext'), workers=None, chunksize=20000):
+    """stock_index.csv rows (id, stock_symbol, created_utc) for every symbol each post mentions.
+
+    posts.csv is read in chunks of chunksize rows that are matched in
+    parallel; rows keep the posts' order with each post's symbols sorted.
+    """
+    workers = workers or cpu_count()
+    chunks = _chunks(posts_path, text_columns, chunksize)
+    init_args = (companies, tickers, min_bare_ticker_len)
+    if workers <= 1:
+        _init_worker(*init_args)
+        results = [_index_chunk(chunk) for chunk in chunks]
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            results = list(pool.imap(_index_chunk, chunks))
+
+    index_df = pd.DataFrame([row for rows in results for row in rows], columns=['id', 'stock_symbol', 'created_utc'])
+    if output_path is not None:
+        index_df.to_csv(output_path, index=False)
+    return index_df
+
+
+def benchmark(n_texts=20000, universe_sizes=(10, 100, 1000), seed=0):
+    """Texts/sec of TickerMatcher and of the per-stock substring loop as the universe grows."""
+    from sentiment_scoring import benchmark_texts
+
+    rng = np.random.default_rng(seed)
+    texts = benchmark_texts(n_texts, seed)
+    for size in universe_sizes:
+        letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+        companies = {f"T{k:04d}": [''.join(rng.choice(letters, size=rng.integers(4, 12)))] for k in range(size)}
+        names = [name for names in companies.values() for name in names]
+        # Make a share of the texts mention a company
+        tagged = [f"{text} {names[k % len(names)]}" if k % 4 == 0 else text for k, text in enumerate(texts)]
+
+        matcher = TickerMatcher(companies)
+        start = time.perf_counter()
+        matcher.match_many(tagged)
+        matcher_rate = n_texts / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for text in tagged:
+            [name for name in names if name in text]
+        loop_rate = n_texts / (time.perf_counter() - start)
+        print(f"{size:5d} symbols: matcher {matcher_rate:,.0f} texts/s, substring loop {loop_rate:,.0f} texts/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Regenerate stock_index.csv from posts.csv with the ticker matcher.")
+    parser.add_argument('--posts', help="posts.csv to scan")
+    parser.add_argument('--output', help="Where to write the stock_index CSV")
+    parser.add_argument('--workers', type=int, default=None, help="Matching processes (default: all cores)")
+    parser.add_argument('--chunksize', type=int, default=20000, help="posts.csv rows per chunk")
+    parser.add_argument('--benchmark', action='store_true', help="Time the matcher against the substring loop")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    elif args.posts:
+        start = time.perf_counter()
+        index_df = build_stock_index(args.posts, args.output, workers=args.workers, chunksize=args.chunksize)
+        print(f"{len(index_df)} rows for {index_df['id'].nunique()} posts in {time.perf_counter() - start:.2f}s")
+    else:
+        parser.error("--posts or --benchmark is required")
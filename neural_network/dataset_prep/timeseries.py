@@ -0,0 +1,93 @@
+import os
+import argparse
+import numpy as np
+
+import schema
+
+dataset_prep_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Feature columns of each variant, in the order the timeseries notebooks use
+FEATURE_COLS = {
+    'avg': [
+        'LogReturn_Close', 'LogReturn_Volume',
+        'average_pos', 'average_neg', 'average_neu',
+    ],
+    'ratio': [
+        'LogReturn_Close', 'LogReturn_Volume',
+        'positive_ratio', 'negative_ratio', 'neutral_ratio'
+    ],
+    'avg_ratio': [
+        'LogReturn_Close', 'LogReturn_Volume',
+        'average_pos', 'average_neg', 'average_neu',
+        'positive_ratio', 'negative_ratio', 'neutral_ratio'
+    ],
+}
+
+# Days without posts get an even split between the three sentiments
+FILL_VALUE = 0.333333
+PRICE_COLS = ['Close', 'Volume', 'Open', 'High', 'Low']
+
+
+def timeseries_frame(df, i):
+    """The timeseries notebooks' per-stock step on a (variant, stock) frame of the feature store.
+
+    Fills missing sentiment, adds the log returns of Close and Volume, drops
+    the first row (it has no previous day) and the raw price columns, and
+    labels the rows with the int16 code i of Stock_{i}. Every feature is float32.
+    """
+    df = df.fillna(FILL_VALUE)
+    df['LogReturn_Close'] = np.log(df['Close'] / df['Close'].shift(1)).astype(schema.FLOAT)
+    df['LogReturn_Volume'] = np.log(df['Volume'] / df['Volume'].shift(1)).astype(schema.FLOAT)
+    df = df.dropna()
+    df = df.drop(columns=PRICE_COLS)
+    df.insert(0, 'Stock', np.full(len(df), i, dtype=schema.LABEL))
+    return df
+
+
+def build_windows(variant, stocks=None, store=None, output_dir=dataset_prep_dir, sequence_length=20):
+    """The timeseries notebooks end to end: scaled windows of every stock in all_{variant}/, scaler in the store.
+
+    Stocks default to the variant's tickers in the store. Every window is
+    labelled with its ticker's position in the store order, whatever order
+    or subset of stocks is given, so labels match update_features and
+    backtest.
+    """
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    from feature_store import FeatureStore
+    from windowing import make_windows
+
+    store = store or FeatureStore()
+    tickers = store.tickers(variant)
+    stocks = stocks or tickers
+    unknown = [stock for stock in stocks if stock not in tickers]
+    if unknown:
+        raise ValueError(f"{', '.join(unknown)} not in the {variant} feature store's tickers {tickers}; "
+                         f"add them with dataset_all.py first")
+    feature_cols = FEATURE_COLS[variant]
+    combined_df = pd.concat([timeseries_frame(store.read(variant, stock), tickers.index(stock)) for stock in stocks],
+                            ignore_index=True)
+    scaler = StandardScaler()
+    combined_df[feature_cols] = scaler.fit_transform(combined_df[feature_cols])
+
+    windows = make_windows(combined_df, feature_cols, target_col='LogReturn_Close', sequence_length=sequence_length)
+    windows.save(os.path.join(output_dir, f'all_{variant}'), variant)
+    store.save_scaler(variant, scaler)
+    return windows
+
+
+if __name__ == '__main__':
+    from feature_store import FeatureStore, store_dir
+
+    parser = argparse.ArgumentParser(description="Scale the feature store's rows and cut them into window stores.")
+    parser.add_argument('--variants', nargs='+', choices=list(FEATURE_COLS), default=list(FEATURE_COLS))
+    parser.add_argument('--stocks', nargs='+', default=None, help="Default: every ticker of the variant in the store")
+    parser.add_argument('--store', default=store_dir, help="Feature store folder")
+    parser.add_argument('--output-dir', default=dataset_prep_dir, help="Folder the all_{variant} window stores go in")
+    parser.add_argument('--sequence-length', type=int, default=20)
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store)
+    for variant in args.variants:
+        windows = build_windows(variant, args.stocks, store, args.output_dir, args.sequence_length)
+        print(f"{variant}: {len(windows)} windows of shape {windows.shape[1:]}")
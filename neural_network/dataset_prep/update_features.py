@@ -0,0 +1,204 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from dataset_all import (stocks, VARIANTS, dataset_prep_dir, data_root, cache_path, ingest_cache_dir,
+                         load_post_stock, load_prices, score_posts, stock_posts, build_variant)
+from daily_sentiment import daily_sentiment_table, ticker_slices
+from ingest import IngestCache
+from feature_store import FeatureStore, store_dir
+from sentiment_cache import SentimentCache
+import dedup
+import schema
+from timeseries import FEATURE_COLS, timeseries_frame
+from windowing import load_windows, save_window_index, append_rows
+import instrumentation
+from instrumentation import stage
+
+# frozen: scale new rows with the saved scaler as is
+# streaming: partial_fit the scaler on the new rows and re-express the stored rows in its new statistics
+SCALER_MODES = ['frozen', 'streaming']
+
+one_day = pd.Timedelta(days=1)
+
+
+def check_window_store(variant, output_dir=dataset_prep_dir, store=None):
+    """Raise unless the variant has a float32 window store and a saved scaler to append to."""
+    store = store or FeatureStore()
+    folder = os.path.join(output_dir, f'all_{variant}')
+    missing = [name for name in [f'{variant}_features.npy', f'{variant}_windows.npz']
+               if not os.path.exists(os.path.join(folder, name))]
+    if missing:
+        raise FileNotFoundError(f"No {variant} window store to append to ({', '.join(missing)} missing in {folder}); "
+                                f"build it with timeseries.py")
+    if store.load_scaler(variant) is None:
+        raise ValueError(f"The {variant} feature store has no saved scaler; build the windows with timeseries.py")
+    windows = load_windows(folder, variant)
+    if windows.features.dtype != schema.FLOAT or windows.y.dtype != schema.FLOAT:
+        raise ValueError(f"{folder} holds {windows.features.dtype} rows from before the float32 schema; "
+                         f"rebuild it with timeseries.py")
+
+
+def append_windows(variant, rows_by_stock, scaler_mode='frozen', output_dir=dataset_prep_dir, store=None):
+    """Scale the new timeseries rows and append them and their windows to the variant's store.
+
+    rows_by_stock maps the stock position i (its int16 label) to the
+    timeseries_frame rows of its new days. Each stock's new rows are
+    appended together with its last sequence_length + horizon - 1 stored
+    rows, so the new windows stay contiguous and only they are added. The
+    scaler is the one kept in the feature store's metadata.
+    """
+    store = store or FeatureStore()
+    folder = os.path.join(output_dir, f'all_{variant}')
+    feature_cols = FEATURE_COLS[variant]
+    target = feature_cols.index('LogReturn_Close')
+    features_path = os.path.join(folder, f'{variant}_features.npy')
+
+    scaler = store.load_scaler(variant)
+    check_window_store(variant, output_dir, store)
+    windows = load_windows(folder, variant, mmap_mode='r+' if scaler_mode == 'streaming' else 'r')
+    y = np.array(windows.y)
+
+    if scaler_mode == 'streaming':
+        old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+        scaler.partial_fit(pd.concat(rows_by_stock.values())[feature_cols])
+        # An affine pass over the stored rows; no window is rebuilt
+        windows.features[:] = (windows.features * old_scale + old_mean - scaler.mean_) / scaler.scale_
+        windows.features.flush()
+        y = ((y * old_scale[target] + old_mean[target] - scaler.mean_[target]) / scaler.scale_[target]).astype(schema.FLOAT)
+        store.save_scaler(variant, scaler)
+
+    L, h = windows.sequence_length, windows.horizon
+    starts, ys, labels, dates = [windows.starts], [y], [windows.labels], [windows.dates]
+    for i, rows in rows_by_stock.items():
+        own = np.flatnonzero(windows.labels == i)
+        if not len(own):
+            print(f"No stored windows for Stock_{i}, rebuild {variant} with timeseries.py")
+            continue
+
+        last_row = windows.starts[own].max() + L - 1 + h
+        bridge = np.array(windows.features[last_row - (L + h - 2):last_row + 1])
+        scaled = scaler.transform(rows[feature_cols]).astype(schema.FLOAT, copy=False)
+        first = append_rows(features_path, np.concatenate([bridge, scaled]))
+
+        # Window j of the segment ends at bridge row j + L - 1 and targets new row j
+        starts.append(first + np.arange(len(rows)))
+        ys.append(scaled[:, target])
+        labels.append(np.full(len(rows), i, dtype=schema.LABEL))
+        dates.append(np.asarray(rows['Date'], dtype=schema.DATE))
+
+    save_window_index(folder, variant, np.concatenate(starts), np.concatenate(ys), np.concatenate(labels),
+                      np.concatenate(dates), L, h)
+    print(f"{variant}: {sum(len(s) for s in starts[1:])} new windows")
+
+
+def append_features(stocks=stocks, variants=VARIANTS, end=None, scaler_mode='frozen', data_root=data_root,
+                    output_dir=dataset_prep_dir, cache_path=cache_path, ingest_cache_dir=ingest_cache_dir,
+                    workers=None, chunksize=256, store_dir=store_dir, dedup_mode='off', duplicates='count',
+                    dedup_threshold=dedup.THRESHOLD):
+    """Extend the feature store's rows and scalers and the window stores with the days after their last date.
+
+    Only posts from the first missing day on are read and scored, and only
+    the new rows and windows are written. end is an inclusive last date; by
+    default every available day is added. The dedup arguments are
+    build_features'; duplicates are only looked for among the new posts.
+    """
+    if scaler_mode not in SCALER_MODES:
+        raise ValueError(f"Unknown scaler mode: {scaler_mode}")
+    if duplicates not in dedup.POLICIES:
+        raise ValueError(f"Unknown duplicates policy: {duplicates}")
+
+    # The store's index knows every ticker's last date without reading its rows
+    store = FeatureStore(store_dir)
+    # Window labels are positions in the store's ticker order (build_windows), whatever order stocks come in
+    labels = {}
+    for variant in variants:
+        tickers = store.tickers(variant)
+        for stock in stocks:
+            if stock not in tickers:
+                raise ValueError(f"{stock} is not one of the {variant} feature store's tickers {tickers}, "
+                                 f"so its windows have no label to append to; add it with dataset_all.py "
+                                 f"and rebuild the windows with timeseries.py")
+            labels[variant, stock] = tickers.index(stock)
+    # Checked before anything is appended, so a missing window store cannot leave the feature store ahead of it
+    for variant in variants:
+        check_window_store(variant, output_dir, store)
+    stored_last = {(variant, stock): store.last_date(variant, stock) for variant in variants for stock in stocks}
+    empty = sorted({stock for (variant, stock), last in stored_last.items() if last is None})
+    if empty:
+        raise ValueError(f"No rows stored yet for {', '.join(empty)}; build them with "
+                         f"dataset_all.py --stocks {' '.join(empty)} before appending days")
+    last_dates = {stock: min(stored_last[variant, stock] for variant in variants) for stock in stocks}
+    start = pd.Timestamp(min(last_dates.values())) + one_day
+    end = pd.Timestamp(end) + one_day if end is not None else None
+
+    ingest = IngestCache(data_root, ingest_cache_dir)
+    post_stock_df = load_post_stock(ingest, start, end)
+    cache = SentimentCache(cache_path) if cache_path else None
+    scored_df = score_posts(post_stock_df, stocks, cache, workers, chunksize, dedup_mode, dedup_threshold)
+    if cache is not None:
+        cache.report()
+        cache.close()
+
+    with stage('daily_aggregation') as s:
+        posts_df = stock_posts(post_stock_df, stocks, scored_df)
+        if duplicates == 'collapse':
+            posts_df = dedup.collapse_duplicates(posts_df)
+        daily_table = daily_sentiment_table(posts_df)
+        daily_by_stock = ticker_slices(daily_table)
+        s.rows = len(posts_df)
+
+    new_rows = {variant: {} for variant in variants}
+    for stock in stocks:
+        price_df = load_prices(ingest, stock, pd.Timestamp(last_dates[stock]) + one_day, end)
+        daily_df = daily_by_stock.get(stock.upper(), daily_table.iloc[0:0])
+
+        for variant in variants:
+            last = stored_last[variant, stock]
+            with stage('build_variant', ticker=stock, variant=variant) as s:
+                added = build_variant(variant, price_df[price_df['Date'] > pd.Timestamp(last)], daily_df)
+                s.rows = len(added)
+            if added.empty:
+                continue
+            # The last stored day is the boundary row the first new log return needs
+            boundary = store.read(variant, stock, start=last, end=last)
+            with stage('store_append', ticker=stock, variant=variant, rows=len(added)):
+                store.append(variant, stock, added)
+
+            i = labels[variant, stock]
+            new_rows[variant][i] = timeseries_frame(pd.concat([boundary, added], ignore_index=True), i)
+            print(f"{stock} {variant}: {len(added)} new days")
+
+    for variant in variants:
+        if new_rows[variant]:
+            with stage('append_windows', variant=variant, rows=sum(len(rows) for rows in new_rows[variant].values())):
+                append_windows(variant, new_rows[variant], scaler_mode, output_dir, store)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Append new trading days to the feature store and window stores.")
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS)
+    parser.add_argument('--stocks', nargs='+', default=stocks,
+                        help="Stocks to extend, any subset of the feature store's tickers")
+    parser.add_argument('--end', default=None, help="Last date to add (default: all available)")
+    parser.add_argument('--scaler', choices=SCALER_MODES, default='frozen')
+    parser.add_argument('--data-root', default=data_root,
+                        help="Folder holding post_data/ and price_data/")
+    parser.add_argument('--output-dir', default=dataset_prep_dir, help="Folder holding the all_{variant} window stores")
+    parser.add_argument('--store', default=store_dir, help="Feature store folder")
+    parser.add_argument('--cache', default=cache_path,
+                        help="SQLite file for cached sentiment scores")
+    parser.add_argument('--no-cache', action='store_true', help="Score every new post from scratch")
+    parser.add_argument('--ingest-cache', default=ingest_cache_dir,
+                        help="Folder for the Parquet copies of the input CSVs")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument('--chunksize', type=int, default=256, help="Posts sent to a worker per batch")
+    dedup.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrumentation.configure_from_args(args)
+    append_features(args.stocks, args.variants, args.end, args.scaler, args.data_root, args.output_dir,
+                    None if args.no_cache else args.cache, args.ingest_cache, args.workers, args.chunksize, args.store,
+                    args.dedup, args.duplicates, args.dedup_threshold)
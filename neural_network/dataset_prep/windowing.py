@@ -0,0 +1,229 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import schema
+
+SPLITS = ('train', 'val', 'test')
+
+
+def array_windows(values, sequence_length, horizon=1, stride=1):
+    """(N, sequence_length, n_features) view over the rows of a 2-D array.
+
+    Only windows that still have a target `horizon` rows after their last
+    row are kept, the same count as `for i in range(sequence_length,
+    len(values))` when horizon=1. Nothing is copied.
+    """
+    values = np.asarray(values)
+    n_windows = len(values) - sequence_length - horizon + 1
+    if n_windows <= 0:
+        return np.empty((0, sequence_length, values.shape[1]), dtype=values.dtype)
+    windows = sliding_window_view(values, sequence_length, axis=0).transpose(0, 2, 1)
+    return windows[:n_windows:stride]
+
+
+class WindowSet:
+    """Windows over a feature matrix that holds every ticker back to back.
+
+    `windows` is the zero-copy (rows - sequence_length + 1, sequence_length,
+    n_features) view over all rows; `starts` picks the windows that stay
+    inside one ticker. y and labels are aligned with `starts`. Indexing or
+    to_array() is what copies windows out.
+    """
+
+    def __init__(self, features, starts, sequence_length, y, labels, dates=None, horizon=1):
+        self.features = features
+        self.starts = starts
+        self.sequence_length = sequence_length
+        self.horizon = horizon
+        self.y = y
+        self.labels = labels
+        self.dates = dates
+        self.windows = array_windows(features, sequence_length, horizon=0)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        return self.windows[self.starts[idx]]
+
+    @property
+    def shape(self):
+        return (len(self.starts), self.sequence_length, self.features.shape[1])
+
+    def to_array(self, dtype=None):
+        X = self.windows[self.starts]
+        return X if dtype is None else X.astype(dtype, copy=False)
+
+    def save(self, folder, prefix):
+        """Write {prefix}_features.npy (flat rows) and {prefix}_windows.npz (window index).
+
+        The windows themselves are never written, so the files are about
+        sequence_length times smaller than the materialized X. Rows must be
+        float32 (schema.FLOAT).
+        """
+        schema.check_array(self.features, schema.FLOAT, f"{prefix} feature rows")
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, f'{prefix}_features.npy'), np.ascontiguousarray(self.features))
+        save_window_index(folder, prefix, self.starts, self.y, self.labels, self.dates,
+                          self.sequence_length, self.horizon)
+
+
+def save_window_index(folder, prefix, starts, y, labels, dates, sequence_length, horizon=1):
+    """Write {prefix}_windows.npz: window starts, float32 targets, int16 labels and day target dates."""
+    schema.check_array(y, schema.FLOAT, f"{prefix} targets")
+    schema.check_array(labels, schema.LABEL, f"{prefix} labels")
+    np.savez(os.path.join(folder, f'{prefix}_windows.npz'),
+             starts=starts, y=y, labels=labels, dates=np.asarray(dates, dtype=schema.DATE),
+             sequence_length=sequence_length, horizon=horizon)
+
+
+def load_windows(folder, prefix, mmap_mode='r'):
+    """Open a WindowSet written by WindowSet.save with the feature rows memory-mapped."""
+    features = np.load(os.path.join(folder, f'{prefix}_features.npy'), mmap_mode=mmap_mode)
+    with np.load(os.path.join(folder, f'{prefix}_windows.npz')) as index:
+        horizon = int(index['horizon']) if 'horizon' in index.files else 1
+        labels = index['labels']
+        if labels.dtype.kind == 'U':
+            # Stores written before the int16 codes label their windows 'Stock_{i}'
+            labels = np.char.rpartition(labels, '_')[:, 2].astype(schema.LABEL)
+        return WindowSet(features, index['starts'], int(index['sequence_length']),
+                         index['y'], labels, index['dates'], horizon)
+
+
+def chronological_split(windows, train_frac=0.9, val_frac=0.05):
+    """{'train', 'val', 'test'} -> window indices, split along time within each ticker.
+
+    Every ticker contributes its oldest train_frac windows to train, the
+    next val_frac to val and the newest rest to test, ordered by target
+    date. Nothing is random, so the same store always gives the same split.
+    """
+    order = windows.dates if windows.dates is not None else windows.starts
+    parts = {name: [] for name in SPLITS}
+    for label in np.unique(windows.labels):
+        own = np.flatnonzero(windows.labels == label)
+        own = own[np.argsort(order[own], kind='stable')]
+        n_train = int(train_frac * len(own))
+        n_val = int(val_frac * len(own))
+        parts['train'].append(own[:n_train])
+        parts['val'].append(own[n_train:n_train + n_val])
+        parts['test'].append(own[n_train + n_val:])
+    return {name: np.sort(np.concatenate(parts[name])) for name in SPLITS}
+
+
+def append_rows(path, rows):
+    """Append rows to a 2-D .npy file in place; returns the index of the first new row.
+
+    Only the header is rewritten. NumPy pads .npy headers so the row count
+    can grow without the header changing size.
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+
+        rows = np.ascontiguousarray(rows, dtype=dtype)
+        if fortran_order or rows.ndim != 2 or rows.shape[1] != shape[1]:
+            raise ValueError(f"Cannot append rows of shape {rows.shape} to {path} with shape {shape}")
+
+        f.seek(0, os.SEEK_END)
+        f.write(rows.tobytes())
+
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                  'shape': (shape[0] + len(rows), shape[1])}
+        f.seek(0)
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(f, header)
+        else:
+            np.lib.format.write_array_header_2_0(f, header)
+        if f.tell() != data_offset:
+            raise ValueError(f"Header of {path} cannot grow in place")
+    return shape[0]
+
+
+def make_windows(df, feature_cols, target_col='LogReturn_Close', sequence_length=20, horizon=1, stride=1,
+                 group_col='Stock', date_col='Date'):
+    """Sliding windows for every ticker in df at once.
+
+    Reproduces the timeseries notebooks' loop: tickers in sorted group_col
+    order, rows sorted by date_col, window i covers rows i..i+sequence_length-1
+    and its target is target_col `horizon` rows after the window. Tickers
+    with no more than sequence_length + horizon rows are skipped.
+    """
+    df = df.sort_values([group_col, date_col], kind='stable')
+    features = df[feature_cols].to_numpy()
+    target = df[target_col].to_numpy()
+    groups = df[group_col].to_numpy()
+    dates = df[date_col].to_numpy()
+
+    bounds = np.r_[0, np.flatnonzero(groups[1:] != groups[:-1]) + 1, len(groups)] if len(groups) else [0]
+    starts = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        # Ensure we have enough data for at least one sequence
+        if stop - start > sequence_length + horizon:
+            starts.append(np.arange(start, stop - sequence_length - horizon + 1, stride))
+    starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+    # Target of each window sits `horizon` rows after its last row
+    target_idx = starts + sequence_length - 1 + horizon
+    if np.issubdtype(dates.dtype, np.datetime64):
+        dates = dates.astype(schema.DATE)
+    return WindowSet(features, starts, sequence_length, target[target_idx], groups[starts], dates[target_idx], horizon)
+
+
+def loop_windows(combined_df, feature_cols, sequence_length=20):
+    """The timeseries notebooks' window loop, kept as the benchmark baseline."""
+    X, y, stock_labels = [], [], []
+    for stock, group in combined_df.groupby('Stock'):
+        group = group.sort_values(by='Date').reset_index(drop=True)
+        if len(group) > sequence_length + 1:
+            for i in range(len(group) - sequence_length):
+                X.append(group[feature_cols].iloc[i:i + sequence_length].values)
+                y.append(group['LogReturn_Close'].iloc[i + sequence_length])
+                stock_labels.append(stock)
+    return np.array(X), np.array(y), stock_labels
+
+
+def benchmark(n_stocks=7, n_days=1250, n_features=8, sequence_length=20):
+    """Time loop_windows against make_windows on a synthetic frame and check they agree."""
+    rng = np.random.default_rng(0)
+    feature_cols = ['LogReturn_Close'] + [f'feature_{j}' for j in range(n_features - 1)]
+    dates = pd.bdate_range('2018-01-03', periods=n_days).date
+    combined_df = pd.concat([
+        pd.DataFrame({'Stock': f'Stock_{i}', 'Date': dates,
+                      **{col: rng.normal(size=n_days) for col in feature_cols}})
+        for i in range(n_stocks)
+    ], ignore_index=True)
+
+    start = time.perf_counter()
+    X_loop, y_loop, labels_loop = loop_windows(combined_df, feature_cols, sequence_length)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    windows = make_windows(combined_df, feature_cols, sequence_length=sequence_length)
+    view_time = time.perf_counter() - start
+    X = windows.to_array()
+    total_time = time.perf_counter() - start
+
+    assert np.array_equal(X, X_loop) and np.array_equal(windows.y, y_loop)
+    assert list(windows.labels) == labels_loop
+    print(f"{len(windows)} windows of shape {X.shape[1:]}")
+    print(f"python loop:          {loop_time:8.3f}s")
+    print(f"make_windows (view):  {view_time:8.3f}s")
+    print(f"make_windows (array): {total_time:8.3f}s  ({loop_time / total_time:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark vectorized windowing against the notebook loop.")
+    parser.add_argument('--stocks', type=int, default=7)
+    parser.add_argument('--days', type=int, default=1250)
+    parser.add_argument('--features', type=int, default=8)
+    args = parser.parse_args()
+
+    benchmark(args.stocks, args.days, args.features)
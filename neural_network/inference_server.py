@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+neural_network_dir = os.path.dirname(os.path.abspath(__file__))
+models_dir = os.path.join(neural_network_dir, 'models')
+sys.path.append(os.path.join(neural_network_dir, 'dataset_prep'))
+from feature_store import FeatureStore, store_dir
+
+# Feature variant -> saved model; its scaler is in the feature store's metadata for the variant
+MODELS = {
+    'avg': 'avg_lstm_model.keras',
+    'ratio': 'ratio_lstm_model.keras',
+    'avg_ratio': 'avg_ratio_lstm_model.keras',
+}
+
+
+class ModelBatcher:
+    """Serves one model: collects concurrent requests into single predict calls.
+
+    A batch is closed once it holds max_batch_size windows or max_wait_ms
+    passed since its first request arrived, whichever comes first.
+    """
+
+    def __init__(self, variant, model, scaler, max_batch_size=64, max_wait_ms=5.0, history=10000):
+        self.variant = variant
+        self.model = model
+        self.mean = scaler.mean_.astype(np.float32)
+        self.scale = scaler.scale_.astype(np.float32)
+        self.input_shape = tuple(model.input_shape[1:])
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=history)
+        self.batch_sizes = Counter()
+        self.lock = threading.Lock()
+
+        # Batches are padded to power-of-two sizes; trace each size once up front
+        self.buckets = sorted({min(2 ** i, max_batch_size) for i in range(max_batch_size.bit_length() + 1)})
+        for size in self.buckets:
+            self._predict(np.zeros((size,) + self.input_shape, dtype=np.float32))
+        self.thread = threading.Thread(target=self._run, name=f'batcher-{variant}', daemon=True)
+        self.thread.start()
+
+    def _predict(self, X):
+        n = len(X)
+        size = next((size for size in self.buckets if size >= n), n)
+        if size > n:
+            X = np.concatenate([X, np.zeros((size - n,) + X.shape[1:], dtype=X.dtype)])
+        return np.asarray(self.model.predict_on_batch(X), dtype=np.float64).reshape(-1)[:n]
+
+    def submit(self, window, scaled=False):
+        """Queue one (sequence_length, n_features) window; returns a Future of its prediction.
+
+        Raw windows are scaled with the variant's scaler; the result is the
+        next day's log return with the scaling undone.
+        """
+        window = np.asarray(window, dtype=np.float32)
+        if window.shape != self.input_shape:
+            raise ValueError(f"{self.variant} expects a window of shape {self.input_shape}, got {window.shape}")
+        if not scaled:
+            window = (window - self.mean) / self.scale
+        future = Future()
+        self.requests.put((window, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                predictions = self._predict(np.stack([window for window, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            # The target is the scaled LogReturn_Close, the first feature column
+            log_returns = predictions * self.scale[0] + self.mean[0]
+            done = time.perf_counter()
+            with self.lock:
+                self.batch_sizes[len(batch)] += 1
+                self.latencies.extend(done - submitted for _, _, submitted in batch)
+            for (_, future, _), log_return in zip(batch, log_returns):
+                future.set_result(float(log_return))
+
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+        return {
+            'requests': int(sum(size * count for size, count in batch_sizes.items())),
+            'batches': int(sum(batch_sizes.values())),
+            'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'batch_size_histogram': batch_sizes,
+        }
+
+
+class InferenceServer:
+    """Loads each saved model and its scaler once and serves them in-process."""
+
+    def __init__(self, variants=MODELS, max_batch_size=64, max_wait_ms=5.0,
+                 models_dir=models_dir, store_dir=store_dir):
+        import keras
+
+        store = FeatureStore(store_dir)
+        self.batchers = {}
+        for variant in variants:
+            model = keras.models.load_model(os.path.join(models_dir, MODELS[variant]), compile=False)
+            scaler = store.load_scaler(variant)
+            self.batchers[variant] = ModelBatcher(variant, model, scaler, max_batch_size, max_wait_ms)
+
+    def submit(self, variant, window, scaled=False):
+        if variant not in self.batchers:
+            raise KeyError(f"No model loaded for variant {variant!r}")
+        return self.batchers[variant].submit(window, scaled)
+
+    def predict(self, variant, window, scaled=False, timeout=None):
+        return self.submit(variant, window, scaled).result(timeout)
+
+    def stats(self):
+        return {variant: batcher.stats() for variant, batcher in self.batchers.items()}
+
+
+def make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        """POST /predict/<variant> with {"window": [[...], ...], "scaled": false}; GET /stats."""
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, server.stats())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 2 or parts[0] != 'predict':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                log_return = server.predict(parts[1], body['window'], body.get('scaled', False))
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+                return
+            self._send(200, {'variant': parts[1], 'log_return': log_return})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host='127.0.0.1', port=8000, **kwargs):
+    server = InferenceServer(**kwargs)
+    httpd = ThreadingHTTPServer((host, port), make_handler(server))
+    print(f"Serving {', '.join(server.batchers)} on http://{host}:{port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        print(json.dumps(server.stats(), indent=1))
+
+
+def load_test(requests=2000, concurrency=32, **kwargs):
+    """Offline check against the committed models: concurrent random windows, then the stats."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    server = InferenceServer(**kwargs)
+    variants = list(server.batchers)
+    # A Generator is not thread-safe; each pool thread draws from its own, spawned from one seed
+    seeds = iter(np.random.SeedSequence(0).spawn(concurrency))
+    seeds_lock = threading.Lock()
+    local = threading.local()
+
+    def init_thread():
+        with seeds_lock:
+            local.rng = np.random.default_rng(next(seeds))
+
+    def one(i):
+        variant = variants[i % len(variants)]
+        window = local.rng.normal(size=server.batchers[variant].input_shape)
+        return server.predict(variant, window, scaled=True)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency, initializer=init_thread) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{requests} requests in {elapsed:.2f}s ({requests / elapsed:.0f} req/s)")
+    print(json.dumps(server.stats(), indent=1))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batched inference server for the saved LSTM models.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--variants', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--load-test', type=int, default=0, metavar='N',
+                        help="Send N concurrent in-process requests instead of serving HTTP")
+    args = parser.parse_args()
+
+    options = dict(variants=args.variants, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    if args.load_test:
+        load_test(args.load_test, **options)
+    else:
+        serve(args.host, args.port, **options)
@@ -0,0 +1,160 @@
+import io
+import re
+import json
+import time
+import zipfile
+import argparse
+
+import h5py
+import numpy as np
+
+
+def _snake_case(name):
+    # Same rule Keras uses for the weight paths: LSTM -> lstm, GRUCell -> gru_cell
+    name = re.sub(r'(.)([A-Z][a-z]+)', r'\1_\2', name)
+    return re.sub(r'([a-z])([A-Z])', r'\1_\2', name).lower()
+
+
+def _read(weights, key, dtype):
+    # Read as stored and cast in NumPy; HDF5's own float16 conversion can round some values wrong
+    return weights[key][()].astype(dtype)
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+class LSTMLayer:
+    """Keras LSTM forward pass; gates are packed i, f, c, o like the Keras kernel."""
+
+    def __init__(self, kernel, recurrent_kernel, bias, return_sequences):
+        self.kernel = kernel
+        self.recurrent_kernel = recurrent_kernel
+        self.bias = bias
+        self.units = recurrent_kernel.shape[0]
+        self.return_sequences = return_sequences
+
+    def __call__(self, x, dtype):
+        batch, steps, _ = x.shape
+        units = self.units
+        recurrent_kernel = self.recurrent_kernel.astype(dtype, copy=False)
+
+        # Input projections of every timestep in one matmul; only the recurrence is sequential
+        z_x = x @ self.kernel.astype(dtype, copy=False) + self.bias.astype(dtype, copy=False)
+        h = np.zeros((batch, units), dtype=dtype)
+        c = np.zeros((batch, units), dtype=dtype)
+        outputs = np.empty((batch, steps, units), dtype=dtype) if self.return_sequences else None
+        for t in range(steps):
+            z = z_x[:, t] + h @ recurrent_kernel
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if outputs is not None:
+                outputs[:, t] = h
+        return outputs if outputs is not None else h
+
+
+class DenseLayer:
+    def __init__(self, kernel, bias, activation):
+        if activation not in ('linear', None):
+            raise ValueError(f"Unsupported Dense activation: {activation}")
+        self.kernel = kernel
+        self.bias = bias
+
+    def __call__(self, x, dtype):
+        return x @ self.kernel.astype(dtype, copy=False) + self.bias.astype(dtype, copy=False)
+
+
+class NumpyModel:
+    """TensorFlow-free forward pass of a saved Sequential LSTM/Dropout/Dense model.
+
+    Weights are read straight from the .keras archive. weights_dtype sets
+    how they are kept in memory (float16 halves it); the math runs in
+    float32. Dropout is the identity at inference time.
+    """
+
+    def __init__(self, layers, input_shape):
+        self.layers = layers
+        self.input_shape = input_shape
+
+    @classmethod
+    def load(cls, path, weights_dtype='float32'):
+        with zipfile.ZipFile(path) as archive:
+            config = json.loads(archive.read('config.json'))
+            weights = h5py.File(io.BytesIO(archive.read('model.weights.h5')), 'r')
+
+        if config['class_name'] != 'Sequential':
+            raise ValueError(f"{path} is a {config['class_name']}, only Sequential models are supported")
+
+        layers, input_shape, seen = [], None, {}
+        for layer in config['config']['layers']:
+            class_name, layer_config = layer['class_name'], layer['config']
+            if class_name == 'InputLayer':
+                input_shape = tuple(layer_config['batch_shape'][1:])
+                continue
+
+            # Keras stores weights under the snake-cased class name, de-duplicated with _1, _2, ...
+            name = _snake_case(class_name)
+            count = seen.get(name, 0)
+            seen[name] = count + 1
+            group = f"layers/{name}" if count == 0 else f"layers/{name}_{count}"
+
+            if class_name == 'LSTM':
+                if (layer_config['activation'], layer_config['recurrent_activation']) != ('tanh', 'sigmoid'):
+                    raise ValueError(f"Unsupported LSTM activations in {layer_config['name']}")
+                kernel, recurrent_kernel, bias = (_read(weights, f'{group}/cell/vars/{i}', weights_dtype)
+                                                  for i in range(3))
+                layers.append(LSTMLayer(kernel, recurrent_kernel, bias, layer_config['return_sequences']))
+            elif class_name == 'Dense':
+                kernel, bias = (_read(weights, f'{group}/vars/{i}', weights_dtype) for i in range(2))
+                layers.append(DenseLayer(kernel, bias, layer_config['activation']))
+            elif class_name != 'Dropout':
+                raise ValueError(f"Unsupported layer {class_name} in {path}")
+        weights.close()
+        return cls(layers, input_shape)
+
+    def predict(self, X, batch_size=1024, dtype=np.float32):
+        """(N, sequence_length, n_features) -> (N, 1), like model.predict."""
+        X = np.asarray(X)
+        outputs = []
+        for start in range(0, len(X), batch_size):
+            x = X[start:start + batch_size].astype(dtype, copy=False)
+            for layer in self.layers:
+                x = layer(x, dtype)
+            outputs.append(x)
+        return np.concatenate(outputs) if outputs else np.empty((0, 1), dtype=dtype)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the NumPy forward pass against Keras and time it.")
+    parser.add_argument('model', help="Path to a .keras file")
+    parser.add_argument('--windows', type=int, default=4096)
+    parser.add_argument('--weights-dtype', choices=['float32', 'float16'], default='float32')
+    parser.add_argument('--no-keras', action='store_true', help="Skip the comparison with model.predict")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = NumpyModel.load(args.model, args.weights_dtype)
+    print(f"NumPy load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    X = np.random.default_rng(0).normal(size=(args.windows,) + model.input_shape).astype(np.float32)
+    start = time.perf_counter()
+    y = model.predict(X)
+    elapsed = time.perf_counter() - start
+    print(f"NumPy predict: {args.windows / elapsed:.0f} windows/s")
+
+    if not args.no_keras:
+        import keras
+
+        start = time.perf_counter()
+        keras_model = keras.models.load_model(args.model, compile=False)
+        print(f"Keras load: {(time.perf_counter() - start) * 1000:.1f} ms (after import)")
+        start = time.perf_counter()
+        y_keras = keras_model.predict(X, batch_size=1024, verbose=0)
+        elapsed = time.perf_counter() - start
+        print(f"Keras predict: {args.windows / elapsed:.0f} windows/s")
+        # The saved models run under mixed_float16, so a gap around 1e-2 is Keras' float16 rounding
+        print(f"max |numpy - keras| = {np.abs(y - y_keras).max():.2e}")
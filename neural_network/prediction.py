@@ -1,20 +1,28 @@
-import pandas as pd
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 
-stockID = '2330'
-traindata = 'data/'+ stockID + '_2015_2019_ochlv.csv'
-testdata = 'data/'+ stockID +'_202001_03_ochlv.csv'
-print('traindata = ' + traindata)
-print('testdata = ' + testdata)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset_prep'))
+from windowing import array_windows
+from feature_store import FeatureStore
+
+stockID = 'AAPL'
+# Date ranges of the stock's prices in the feature store, columns in ochlv order
+train_range = ('2018-01-01', '2021-12-31')
+test_range = ('2022-01-01', '2022-12-31')
+price_cols = ['Open', 'Close', 'High', 'Low', 'Volume']
+print('traindata = ' + stockID + ' ' + '..'.join(train_range))
+print('testdata = ' + stockID + ' ' + '..'.join(test_range))
+store = FeatureStore()
 
 dataNum = 5
 timesteps = 20
 epochNum = 200
 
 
-dataset_train = pd.read_csv(traindata)
-training_set = dataset_train.iloc[:,1:dataNum+1].values
+dataset_train = store.read('avg', stockID, *train_range, columns=price_cols)
+training_set = dataset_train.iloc[:,0:dataNum].values
 
 
 # Feature Scaling
@@ -24,15 +32,9 @@ sc = MinMaxScaler(feature_range = (0, 1))
 training_set_scaled = sc.fit_transform(training_set)
 
 
-X_train = []
-Y_train = []
-for i in range(timesteps, len(training_set_scaled)):
-    X_train.append(training_set_scaled[i-timesteps:i, 0:dataNum])    
-    Y_train.append(training_set_scaled[i, 0])                        
-X_train, Y_train = np.array(X_train), np.array(Y_train)
-
-# Reshaping
-X_train = np.reshape(X_train, (X_train.shape[0], X_train.shape[1], dataNum))
+# Windows of the previous `timesteps` rows, target is the next day's first column
+X_train = array_windows(training_set_scaled[:, 0:dataNum], timesteps)
+Y_train = training_set_scaled[timesteps:, 0]
 
 
 from keras.models import Sequential
@@ -51,24 +53,20 @@ regressor.summary()
 regressor.fit(X_train, Y_train, batch_size = 32, epochs = epochNum)
 
 
-test_set = pd.read_csv(testdata)
-real_stock_price = test_set.iloc[:,1:dataNum+1].values
+test_set = store.read('avg', stockID, *test_range, columns=price_cols)
+real_stock_price = test_set.iloc[:,0:dataNum].values
 lenOfReal = len(real_stock_price)
 inputs = real_stock_price
 inputs = sc.transform(inputs)
 
-inputs_test = []
-for i in range(timesteps, len(inputs)):
-  inputs_test.append(inputs[i-timesteps:i, 0:dataNum])
-inputs_test = np.array(inputs_test)
-inputs_test = np.reshape(inputs_test, (inputs_test.shape[0], inputs_test.shape[1], dataNum))
+inputs_test = array_windows(inputs[:, 0:dataNum], timesteps)
 predicted_stock_price = regressor.predict(inputs_test)
 predicted_stock_price = np.pad(predicted_stock_price,((0,0),(0,dataNum-1)),'constant') 
 predicted_stock_price = sc.inverse_transform(predicted_stock_price)
 predicted_stock_price = np.delete(predicted_stock_price, [1, 2, 3, 4], axis=1)
 
 
-real_stock_price = test_set.iloc[timesteps:lenOfReal+1,1:2].values
+real_stock_price = test_set.iloc[timesteps:lenOfReal+1,0:1].values
 plt.plot(real_stock_price, color = 'red', label = 'Real Stock Price')
 plt.plot(predicted_stock_price, color = 'blue', label = 'Predicted Stock Price')
 plt.title('Stock Price Prediction')
@@ -79,8 +77,7 @@ plt.show()
 plt.savefig('pic1.png')
 
 
-real_stock_price_train = pd.read_csv(traindata)
-real_stock_price_train = real_stock_price_train.iloc[timesteps:len(real_stock_price_train)+1,1:2].values
+real_stock_price_train = dataset_train.iloc[timesteps:len(dataset_train)+1,0:1].values
 
 
 predicted_stock_price_train = regressor.predict(X_train)
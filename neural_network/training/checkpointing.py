@@ -0,0 +1,141 @@
+import os
+import json
+import shutil
+import keras
+
+
+def _seed_states(model):
+    # Dropout seed generators; load_model gives them fresh seeds, so they are saved separately
+    return [variable for layer in model.layers for variable in layer.non_trainable_variables
+            if 'seed_generator_state' in variable.path]
+
+
+class ResumableEarlyStopping(keras.callbacks.EarlyStopping):
+    """EarlyStopping whose progress (best value, patience used, best weights) survives a restart.
+
+    Keras resets that progress in on_train_begin, so a resumed fit() would
+    otherwise start counting patience and tracking the best epoch anew.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.restored = None
+
+    def on_train_begin(self, logs=None):
+        super().on_train_begin(logs)
+        if self.restored is not None:
+            self.best, self.wait, self.best_epoch, self.best_weights = self.restored
+            if self.monitor_op is None:
+                # Keras sets best to its initial value when it sets up the monitor on the first epoch end
+                self._set_monitor_op()
+                self.best = self.restored[0]
+
+    def get_state(self):
+        return {'best': None if self.best is None else float(self.best), 'wait': self.wait,
+                'best_epoch': self.best_epoch}
+
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+    """Writes the training state to directory every `every` epochs.
+
+    checkpoint-{epoch}.keras is the full model with its optimizer state
+    (Adam moments, loss scale). state.json holds the next epoch, the file
+    names of the model and best weights that go with it, the history so
+    far, the dropout seed state and the early-stopping progress, whose best
+    weights go to best-{epoch}.weights.h5. Every file goes through a temp
+    name and os.replace, state.json last, and the previous epoch's files
+    are only removed after it, so a crash while saving leaves the previous
+    checkpoint intact and consistent.
+    """
+
+    def __init__(self, directory, every=1, early_stopping=None, history=None):
+        super().__init__()
+        self.directory = directory
+        self.every = every
+        self.early_stopping = early_stopping
+        self.history = {key: list(values) for key, values in (history or {}).items()}
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        if (epoch + 1) % self.every == 0:
+            self.save(epoch + 1)
+
+    def _replace(self, name, write):
+        # write(path) saves to a temp name with the same suffix, which os.replace then moves into place
+        stem, suffix = name.split('.', 1)
+        temp = os.path.join(self.directory, f'{stem}.tmp.{suffix}')
+        write(temp)
+        os.replace(temp, os.path.join(self.directory, name))
+
+    def save(self, next_epoch):
+        os.makedirs(self.directory, exist_ok=True)
+        state = {'epoch': next_epoch, 'checkpoint': _checkpoint_name(next_epoch), 'best_weights': None,
+                 'history': self.history, 'early_stopping': None,
+                 'seeds': [keras.ops.convert_to_numpy(variable).tolist() for variable in _seed_states(self.model)]}
+        self._replace(state['checkpoint'], self.model.save)
+
+        if self.early_stopping is not None:
+            state['early_stopping'] = self.early_stopping.get_state()
+            if self.early_stopping.best_weights is not None:
+                # Written through a copy of the model so the live weights stay untouched
+                best = keras.models.clone_model(self.model)
+                best.set_weights(self.early_stopping.best_weights)
+                state['best_weights'] = _best_weights_name(next_epoch)
+                self._replace(state['best_weights'], best.save_weights)
+
+        def write_state(path):
+            with open(path, 'w') as f:
+                json.dump(state, f)
+
+        self._replace('state.json', write_state)
+        for name in os.listdir(self.directory):
+            if name not in (state['checkpoint'], state['best_weights'], 'state.json'):
+                os.remove(os.path.join(self.directory, name))
+
+
+def _checkpoint_name(epoch):
+    return f'checkpoint-{epoch:05d}.keras'
+
+
+def _best_weights_name(epoch):
+    return f'best-{epoch:05d}.weights.h5'
+
+
+def load_checkpoint(directory, early_stopping=None):
+    """(model, state) from a TrainingCheckpoint directory, or None when there is none.
+
+    The model comes back compiled with its optimizer and dropout seed state. Early-stopping
+    progress is handed to early_stopping for its next on_train_begin. Raises ValueError when
+    state.json does not name the files of its own epoch or they are missing.
+    """
+    state_path = os.path.join(directory, 'state.json')
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        state = json.load(f)
+    epoch = state['epoch']
+    expected = {'checkpoint': _checkpoint_name(epoch)}
+    if state.get('best_weights') is not None:
+        expected['best_weights'] = _best_weights_name(epoch)
+    for key, name in expected.items():
+        if state.get(key) != name or not os.path.exists(os.path.join(directory, name)):
+            raise ValueError(f"{directory}: state.json is for epoch {epoch}, but its {key} {state.get(key)!r} "
+                             f"is not {name} on disk; remove the directory to train from scratch")
+    model = keras.models.load_model(os.path.join(directory, state['checkpoint']))
+    for variable, seed in zip(_seed_states(model), state['seeds']):
+        variable.assign(keras.ops.convert_to_tensor(seed, dtype=variable.dtype))
+
+    if early_stopping is not None and state['early_stopping'] is not None:
+        best_weights = None
+        if state['best_weights'] is not None:
+            best = keras.models.clone_model(model)
+            best.load_weights(os.path.join(directory, state['best_weights']))
+            best_weights = best.get_weights()
+        es = state['early_stopping']
+        early_stopping.restored = (es['best'], es['wait'], es['best_epoch'], best_weights)
+    return model, state
+
+
+def remove_checkpoint(directory):
+    shutil.rmtree(directory, ignore_errors=True)
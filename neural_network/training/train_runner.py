@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+training_dir = os.path.dirname(os.path.abspath(__file__))
+neural_network_dir = os.path.dirname(training_dir)
+models_dir = os.path.join(neural_network_dir, 'models')
+dataset_prep_dir = os.path.join(neural_network_dir, 'dataset_prep')
+registry_path = os.path.join(models_dir, 'training_runs.jsonl')
+
+VARIANTS = ['avg', 'ratio', 'avg_ratio']
+
+# The training notebooks' models: LSTM units per layer and dropout inside the LSTMs
+ARCHITECTURES = {
+    'lstm': {'units': [128, 64, 32], 'dropout': [0.2, 0.2, 0.0]},
+    'lstm_larger': {'units': [256, 128, 64, 32], 'dropout': [0.0, 0.0, 0.0, 0.0]},
+}
+
+HYPERPARAMETERS = {'epochs': 400, 'batch_size': 32, 'learning_rate': 0.001}
+
+# chronological_split fractions every job trains with; recorded with each model so backtest knows its held-out windows
+SPLIT = {'train_frac': 0.9, 'val_frac': 0.05}
+
+
+def build_model(architecture, input_shape, learning_rate=0.001):
+    import tensorflow as tf
+
+    spec = ARCHITECTURES[architecture]
+    layers = [tf.keras.layers.Input(shape=input_shape)]
+    for k, (units, dropout) in enumerate(zip(spec['units'], spec['dropout'])):
+        layers.append(tf.keras.layers.LSTM(units, activation='tanh', return_sequences=k < len(spec['units']) - 1,
+                                           dropout=dropout))
+    layers += [tf.keras.layers.Dropout(0.2), tf.keras.layers.Dense(1)]
+    model = tf.keras.models.Sequential(layers)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='mean_squared_error',
+                  metrics=['mean_squared_error'])
+    return model
+
+
+def make_jobs(variants, architectures, grid):
+    """One job per (variant, architecture, hyperparameter combination).
+
+    Models are named {variant}_{architecture}, as the notebooks save them;
+    hyperparameters with several values in the grid are added to the name.
+    """
+    varying = [key for key, values in grid.items() if len(values) > 1]
+    jobs = []
+    for variant, architecture, values in itertools.product(variants, architectures, itertools.product(*grid.values())):
+        params = dict(zip(grid, values))
+        name = '_'.join([variant, architecture] + [f'{key}{params[key]}' for key in varying])
+        jobs.append({'name': name, 'variant': variant, 'architecture': architecture, **params})
+    return jobs
+
+
+def _init_worker(threads, mixed_precision):
+    # Must run before TensorFlow is imported in this process
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    if mixed_precision:
+        tf.keras.mixed_precision.set_global_policy('mixed_float16')
+
+
+def run_job(job, models_dir=models_dir, dataset_prep_dir=dataset_prep_dir, patience=20, checkpoint_every=10,
+            resume=False):
+    """Train one job and save its model; returns its registry record.
+
+    With patience > 0 training stops once val_loss has not improved for
+    that many epochs and the best epoch's weights are kept. Every
+    checkpoint_every epochs the full training state goes to
+    models_dir/checkpoints/{name}/; resume=True continues from there.
+    """
+    from training_data import load_windows, chronological_split, split_datasets, steps_per_epoch
+    from checkpointing import ResumableEarlyStopping, TrainingCheckpoint, load_checkpoint, remove_checkpoint
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    windows = load_windows(os.path.join(dataset_prep_dir, f"all_{job['variant']}"), job['variant'])
+
+    checkpoint_dir = os.path.join(models_dir, 'checkpoints', job['name'])
+    early_stopping = (ResumableEarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+                      if patience else None)
+    restored = load_checkpoint(checkpoint_dir, early_stopping) if resume else None
+    if restored is not None:
+        model, state = restored
+        initial_epoch, history = state['epoch'], state['history']
+        print(f"{job['name']}: resuming at epoch {initial_epoch}")
+    else:
+        model = build_model(job['architecture'], windows.shape[1:], job['learning_rate'])
+        initial_epoch, history = 0, {}
+
+    # One stream over all epochs, so a resumed run gets the same shuffles as an uninterrupted one
+    train_dataset, val_dataset, test_dataset = split_datasets(windows, batch_size=job['batch_size'], **SPLIT,
+                                                              epochs=job['epochs'], initial_epoch=initial_epoch)
+    steps = steps_per_epoch(chronological_split(windows, **SPLIT)['train'], job['batch_size'])
+
+    checkpoint = TrainingCheckpoint(checkpoint_dir, checkpoint_every, early_stopping, history)
+    callbacks = ([early_stopping] if early_stopping is not None else []) + [checkpoint]
+    model.fit(train_dataset, validation_data=val_dataset, epochs=job['epochs'], initial_epoch=initial_epoch,
+              steps_per_epoch=steps, callbacks=callbacks, verbose=0)
+    test_loss, test_mse = model.evaluate(test_dataset, verbose=0)
+
+    model_path = os.path.join(models_dir, f"{job['name']}_model.keras")
+    model.save(model_path)
+    remove_checkpoint(checkpoint_dir)
+    epochs_run = len(checkpoint.history.get('loss', []))
+    return {
+        **job,
+        'epochs_run': epochs_run,
+        'stopped_early': epochs_run < job['epochs'],
+        'resumed_at_epoch': initial_epoch or None,
+        'best_val_loss': min(checkpoint.history['val_loss']) if checkpoint.history.get('val_loss') else None,
+        'test_mse': float(test_mse),
+        'wall_time_s': round(time.perf_counter() - start, 2),
+        'cpu_time_s': round(time.process_time() - cpu_start, 2),
+        'model_path': _display_path(model_path),
+        'split': SPLIT,
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def _display_path(path):
+    # Relative to neural_network/ for models inside the repo, absolute otherwise
+    path = os.path.abspath(path)
+    return os.path.relpath(path, neural_network_dir) if path.startswith(neural_network_dir + os.sep) else path
+
+
+def record(result, registry_path=registry_path):
+    with open(registry_path, 'a') as f:
+        f.write(json.dumps(result) + '\n')
+
+
+def load_registry(registry_path=registry_path):
+    if not os.path.exists(registry_path):
+        return []
+    with open(registry_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def registered_split(model_path, registry_path=registry_path):
+    """chronological_split fractions a model was trained with, or None when train_runner did not produce it.
+
+    Models trained elsewhere (the notebooks' committed ones used a random
+    split) are not in the registry, and neither is a registered file that
+    was overwritten after its run finished.
+    """
+    model_path = os.path.abspath(model_path)
+    for result in reversed(load_registry(registry_path)):
+        path = result['model_path']
+        if os.path.abspath(path if os.path.isabs(path) else os.path.join(neural_network_dir, path)) != model_path:
+            continue
+        finished = datetime.fromisoformat(result['finished_at']).timestamp()
+        if not os.path.exists(model_path) or os.path.getmtime(model_path) > finished + 1:
+            return None
+        # Runs recorded before the split was stored all used the default one
+        return result.get('split', SPLIT)
+    return None
+
+
+def run_sweep(jobs, workers=None, threads_per_job=None, mixed_precision=True, models_dir=models_dir,
+              dataset_prep_dir=dataset_prep_dir, registry_path=registry_path, patience=20, checkpoint_every=10,
+              resume=False, overwrite=False):
+    """Run jobs in parallel worker processes, each limited to threads_per_job TensorFlow threads.
+
+    By default every job gets its own process and the cores are split
+    evenly between them, so concurrent jobs do not oversubscribe the CPU.
+    Each result is appended to the registry as soon as its job finishes.
+    With resume, jobs already in the registry with their model on disk are
+    skipped and interrupted ones continue from their checkpoints.
+
+    A job whose model file already exists (the committed models are named
+    like the default grid's jobs) raises FileExistsError before anything
+    is trained, unless overwrite is set.
+    """
+    if resume:
+        finished = {result['name'] for result in load_registry(registry_path)
+                    if os.path.exists(os.path.join(models_dir, f"{result['name']}_model.keras"))}
+        skipped = [job['name'] for job in jobs if job['name'] in finished]
+        if skipped:
+            print(f"Already trained: {', '.join(skipped)}")
+        jobs = [job for job in jobs if job['name'] not in finished]
+        if not jobs:
+            return []
+
+    existing = [job['name'] for job in jobs if os.path.exists(os.path.join(models_dir, f"{job['name']}_model.keras"))]
+    if existing and not overwrite:
+        raise FileExistsError(f"{models_dir} already holds models for {', '.join(existing)}; "
+                              f"train into another --models-dir or pass --overwrite")
+
+    cores = os.cpu_count() or 1
+    workers = workers or min(len(jobs), cores)
+    threads_per_job = threads_per_job or max(1, cores // workers)
+    print(f"{len(jobs)} jobs on {workers} workers x {threads_per_job} threads")
+
+    os.makedirs(models_dir, exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    # spawn: TensorFlow is not fork-safe, and each worker must set its thread limits before importing it
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(threads_per_job, mixed_precision)) as pool:
+        futures = {pool.submit(run_job, job, models_dir, dataset_prep_dir, patience, checkpoint_every, resume): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"{job['name']} failed: {e!r}")
+                continue
+            record(result, registry_path)
+            results.append(result)
+            print(f"{result['name']}: test MSE {result['test_mse']:.6f}, {result['epochs_run']} epochs, "
+                  f"{result['wall_time_s']:.1f}s")
+
+    elapsed = time.perf_counter() - start
+    longest = max((result['wall_time_s'] for result in results), default=0)
+    print(f"Sweep: {elapsed:.1f}s wall, slowest job {longest:.1f}s, "
+          f"sum of jobs {sum(result['wall_time_s'] for result in results):.1f}s")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train a grid of feature variants x architectures x hyperparameters in parallel.")
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS)
+    parser.add_argument('--architectures', nargs='+', choices=list(ARCHITECTURES), default=['lstm'])
+    parser.add_argument('--epochs', nargs='+', type=int, default=[HYPERPARAMETERS['epochs']])
+    parser.add_argument('--batch-size', nargs='+', type=int, default=[HYPERPARAMETERS['batch_size']])
+    parser.add_argument('--learning-rate', nargs='+', type=float, default=[HYPERPARAMETERS['learning_rate']])
+    parser.add_argument('--workers', type=int, default=None, help="Parallel jobs (default: one per job, up to the cores)")
+    parser.add_argument('--threads-per-job', type=int, default=None,
+                        help="TensorFlow intra-op threads per job (default: cores / workers)")
+    parser.add_argument('--patience', type=int, default=20,
+                        help="Stop after this many epochs without a better val_loss and keep the best weights (0: off)")
+    parser.add_argument('--checkpoint-every', type=int, default=10, help="Epochs between training-state checkpoints")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip finished jobs and continue interrupted ones from their checkpoints")
+    parser.add_argument('--overwrite', action='store_true', help="Replace models already saved in --models-dir")
+    parser.add_argument('--no-mixed-precision', action='store_true', help="Train in float32")
+    parser.add_argument('--models-dir', default=models_dir)
+    parser.add_argument('--dataset-prep-dir', default=dataset_prep_dir,
+                        help="Folder holding all_{variant}/{variant}_features.npy")
+    parser.add_argument('--registry', default=registry_path, help="JSON-lines file the results are appended to")
+    args = parser.parse_args()
+
+    grid = {'epochs': args.epochs, 'batch_size': args.batch_size, 'learning_rate': args.learning_rate}
+    jobs = make_jobs(args.variants, args.architectures, grid)
+    run_sweep(jobs, args.workers, args.threads_per_job, not args.no_mixed_precision, args.models_dir,
+              args.dataset_prep_dir, args.registry, args.patience, args.checkpoint_every, args.resume, args.overwrite)
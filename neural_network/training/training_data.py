@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+
+training_dir = os.path.dirname(os.path.abspath(__file__))
+dataset_prep_dir = os.path.join(os.path.dirname(training_dir), 'dataset_prep')
+sys.path.append(dataset_prep_dir)
+from windowing import load_windows, chronological_split, SPLITS
+
+# cache='auto' keeps a split's windows in memory only below this size; larger splits are re-read from the rows
+CACHE_MEMORY_LIMIT = 512 * 2 ** 20
+
+
+def make_dataset(windows, indices, batch_size=32, shuffle_buffer=0, seed=0, cache='auto', dtype='float32',
+                 read_size=1024, epochs=None, initial_epoch=0):
+    """tf.data pipeline of (windows, targets) batches for the given window indices.
+
+    Windows are cut from the (memory-mapped) feature rows read_size at a
+    time. cache() keeps them after the first pass: in memory for True, in
+    a file for a path. Either holds every window materialized, which is
+    sequence_length times the rows, so True gives up the memory-mapped
+    footprint for faster later epochs. With False every epoch cuts the
+    windows again and memory stays at the rows in use. 'auto' caches in
+    memory while the split's windows stay under CACHE_MEMORY_LIMIT.
+    shuffle_buffer > 0 shuffles with that bounded buffer, reshuffled
+    every epoch from seed. Batches are prefetched.
+
+    With epochs, the batches of all epochs from initial_epoch on come as
+    one stream, each epoch reshuffled in turn from seed; a run resumed at
+    initial_epoch skips the earlier epochs' batches (without training on
+    them) and so sees the same ones as an uninterrupted run. fit() then
+    needs steps_per_epoch=steps_per_epoch(indices, batch_size).
+    """
+    n_features = windows.features.shape[1]
+    sequence_length = windows.sequence_length
+
+    def gather(batch):
+        return windows[batch].astype(dtype), windows.y[batch].reshape(-1, 1).astype(dtype)
+
+    def read(batch):
+        X, y = tf.numpy_function(gather, [batch], (dtype, dtype))
+        return tf.ensure_shape(X, (None, sequence_length, n_features)), tf.ensure_shape(y, (None, 1))
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    dataset = dataset.batch(read_size).map(read).unbatch()
+    if cache == 'auto':
+        cache = len(indices) * sequence_length * n_features * np.dtype(dtype).itemsize <= CACHE_MEMORY_LIMIT
+    if cache:
+        dataset = dataset.cache() if cache is True else dataset.cache(cache)
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    if epochs is not None:
+        dataset = dataset.repeat(epochs).skip(initial_epoch * steps_per_epoch(indices, batch_size))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def steps_per_epoch(indices, batch_size=32):
+    return -(-len(indices) // batch_size)
+
+
+def split_datasets(windows, batch_size=32, train_frac=0.9, val_frac=0.05, shuffle_buffer=2048, seed=0, cache='auto',
+                   epochs=None, initial_epoch=0):
+    """(train, val, test) datasets of the chronological split; only train is shuffled."""
+    splits = chronological_split(windows, train_frac, val_frac)
+    return tuple(make_dataset(windows, splits[name], batch_size, shuffle_buffer if name == 'train' else 0, seed,
+                              cache, epochs=epochs if name == 'train' else None,
+                              initial_epoch=initial_epoch) for name in SPLITS)
+
+
+def pipeline_throughput(dataset, epochs=2):
+    """Windows/sec the dataset yields in each of `epochs` full passes (the first one fills the cache)."""
+    rates = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        n = 0
+        for X, _ in dataset:
+            n += X.shape[0]
+        rates.append(n / (time.perf_counter() - start))
+    return rates
+
+
+def report_throughput(dataset, model=None, epochs=2, steps=50):
+    """Print the pipeline's windows/sec and, for a compiled model, how fast training consumes them.
+
+    The training rate is timed on a copy of the model, so its weights and
+    optimizer are untouched.
+    """
+    rates = pipeline_throughput(dataset, epochs)
+    print(f"Input pipeline: {', '.join(f'{rate:,.0f}' for rate in rates)} windows/s per epoch")
+    if model is None:
+        return rates, None
+
+    # One cached batch repeated, so the timed fit() costs the model only
+    trainer = tf.keras.models.clone_model(model)
+    trainer.compile(optimizer=type(model.optimizer).from_config(model.optimizer.get_config()), loss=model.loss)
+    X, y = next(iter(dataset))
+    batch = tf.data.Dataset.from_tensors((X, y)).cache()
+    trainer.fit(batch.repeat(2), verbose=0)
+    start = time.perf_counter()
+    trainer.fit(batch.repeat(steps), verbose=0)
+    train_rate = steps * X.shape[0] / (time.perf_counter() - start)
+    verdict = "keeps up" if rates[-1] >= train_rate else "is the bottleneck"
+    print(f"Training step: {train_rate:,.0f} windows/s; the input pipeline {verdict}")
+    return rates, train_rate
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Split a window store chronologically and time its input pipeline.")
+    parser.add_argument('--variant', choices=['avg', 'ratio', 'avg_ratio'], default='avg')
+    parser.add_argument('--dataset-prep-dir', default=dataset_prep_dir,
+                        help="Folder holding all_{variant}/{variant}_features.npy")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--shuffle-buffer', type=int, default=2048)
+    parser.add_argument('--epochs', type=int, default=2)
+    args = parser.parse_args()
+
+    windows = load_windows(os.path.join(args.dataset_prep_dir, f'all_{args.variant}'), args.variant)
+    for name, indices in chronological_split(windows).items():
+        print(f"{name}: {len(indices)} windows")
+    train_dataset, _, _ = split_datasets(windows, args.batch_size, shuffle_buffer=args.shuffle_buffer)
+    report_throughput(train_dataset, epochs=args.epochs)